@@ -1,2 +1,42 @@
+import importlib
+from typing import Dict, Type
+
 from .base_controller import *
-from .volumio import VolumioController
+
+CONTROLLERS: Dict[str, str] = {
+    "rotel": ".rotel:RotelController",
+    "volumio": ".volumio:VolumioController",
+}
+"""Controller classes by name, as ``module:class``. Modules starting with a dot are relative to this package.
+
+A device module is only imported when its controller is asked for, so its dependencies, e.g. ``socketio`` for Volumio,
+aren't loaded by deployments that don't use it.
+"""
+
+
+def register_controller(name: str, path: str):
+    """Registers a controller class, given as ``module:class``, under `name`."""
+    CONTROLLERS[name] = path
+
+
+def get_controller(name: str) -> Type[Controller]:
+    """Returns the controller class registered as `name`, importing its module if needed.
+
+    Raises:
+        ValueError: If there's no controller with this name.
+    """
+    try:
+        path = CONTROLLERS[name]
+    except KeyError:
+        raise ValueError("Unknown controller %s. Should be one of %s." % (name, ", ".join(CONTROLLERS)))
+    module, _, cls = path.partition(":")
+    return getattr(importlib.import_module(module, __name__), cls)
+
+
+def __getattr__(name: str):
+    # Keeps `from controller import VolumioController` working without importing every device module upfront.
+    # Looked up on every call, so controllers registered later are found too.
+    for controller, path in CONTROLLERS.items():
+        if path.partition(":")[2] == name:
+            return get_controller(controller)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -1,7 +1,9 @@
+import asyncio
 import logging
-from asyncio import Event
+import time
+from collections import deque
 from enum import Enum, auto
-from typing import Optional
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, NamedTuple, Optional
 
 
 logger = logging.getLogger(__name__)
@@ -15,20 +17,160 @@ class ControllerStatusException(ControllerException):
     pass
 
 
+class Change(NamedTuple):
+    """A change of a status field. The timestamp is taken from :func:`time.monotonic`."""
+
+    field: str
+    old: Any
+    new: Any
+    timestamp: float
+
+
+class OverflowPolicy(Enum):
+    """What a :class:`Subscription` does with a new change when its queue is full."""
+
+    KEEP_LATEST = auto()
+    """The change replaces the queued change of the same field, keeping its old value. If there's none, the oldest
+    queued change is dropped."""
+    DROP_OLDEST = auto()
+    """The oldest queued change is dropped."""
+
+
+class Subscription:
+    """Queue of the changes published on a :class:`ChangeBus` since the subscriber last read them.
+
+    The queue holds at most `maxsize` changes. Changes to other fields than `fields` are ignored, unless it's ``None``.
+    It can be used as an asynchronous iterator and as a context manager, which unsubscribes on exit.
+    """
+
+    def __init__(
+        self,
+        bus: "ChangeBus",
+        maxsize: int = 100,
+        policy: OverflowPolicy = OverflowPolicy.KEEP_LATEST,
+        fields: Optional[Iterable[str]] = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("Got invalid size %s. Should be at least 1." % maxsize)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.fields = frozenset(fields) if fields is not None else None
+        self.dropped = 0
+        self._bus = bus
+        self._queue: Deque[Change] = deque()
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, change: Change):
+        if self.fields is not None and change.field not in self.fields:
+            return
+
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            if self.policy is OverflowPolicy.KEEP_LATEST:
+                for index, queued in enumerate(self._queue):
+                    if queued.field == change.field:
+                        del self._queue[index]
+                        change = change._replace(old=queued.old)
+                        break
+                else:
+                    self._queue.popleft()
+            else:
+                self._queue.popleft()
+            if change.old == change.new:
+                return
+
+        self._queue.append(change)
+        self._ready.set()
+
+    def get_nowait(self) -> Optional[Change]:
+        """Returns the oldest queued change, or ``None`` if there's none."""
+        return self._queue.popleft() if self._queue else None
+
+    async def get(self) -> Change:
+        """Returns the oldest queued change, waiting for one if needed."""
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Change:
+        return await self.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ChangeBus:
+    """Delivers status changes to any number of subscribers.
+
+    Every subscriber has its own bounded queue, so a slow one doesn't hold the others back nor lose changes unless its
+    queue overflows. See :class:`Subscription`.
+    """
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+
+    def subscribe(
+        self,
+        maxsize: int = 100,
+        policy: OverflowPolicy = OverflowPolicy.KEEP_LATEST,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Subscription:
+        subscription = Subscription(self, maxsize=maxsize, policy=policy, fields=fields)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        try:
+            self._subscriptions.remove(subscription)
+        except ValueError:
+            pass
+
+    def publish(self, field: str, old: Any, new: Any):
+        if not self._subscriptions:
+            return
+        change = Change(field, old, new, time.monotonic())
+        for subscription in self._subscriptions:
+            subscription.put(change)
+
+
+class VolumeSnapshot(NamedTuple):
+    """Immutable copy of a :class:`VolumeStatus`."""
+
+    value: Optional[int]
+    mute: Optional[bool]
+
+
 class VolumeStatus:
     """Holds volume related information.
 
     Attributes can be None if they're not yet known
     If value is not an integer, it will be rounded to the closest one.
+
+    Changes are published on `bus` as the ``volume`` and ``mute`` fields.
     """
 
     MIN = 0
     MAX = 100
 
-    def __init__(self):
+    __slots__ = ("_value", "_mute", "bus")
+
+    def __init__(self, bus: Optional[ChangeBus] = None):
         self._value = None
         self._mute = None
-        self.changed = Event()
+        self.bus = bus or ChangeBus()
 
     @property
     def value(self) -> Optional[int]:
@@ -37,9 +179,10 @@ class VolumeStatus:
     @value.setter
     def value(self, value: int):
         if self.MIN <= value <= self.MAX:
+            value = round(value)
             if value != self._value:
-                self._value = round(value)
-                self.changed.set()
+                old, self._value = self._value, value
+                self.bus.publish("volume", old, value)
         else:
             message = 'Got invalid volume "%s". Should be between %s and %s.' % (value, self.MIN, self.MAX)
             logger.warning(message)
@@ -52,8 +195,11 @@ class VolumeStatus:
     @mute.setter
     def mute(self, value):
         if self._mute != value:
-            self._mute = value
-            self.changed.set()
+            old, self._mute = self._mute, value
+            self.bus.publish("mute", old, value)
+
+    def snapshot(self) -> "VolumeSnapshot":
+        return VolumeSnapshot(self._value, self._mute)
 
 
 class PlaybackState(Enum):
@@ -63,20 +209,147 @@ class PlaybackState(Enum):
     ERROR = auto()
 
 
+class Track(NamedTuple):
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    uri: Optional[str] = None
+
+
+class PlaybackSnapshot(NamedTuple):
+    """Immutable copy of a :class:`PlaybackStatus`."""
+
+    state: Optional[PlaybackState]
+    track: Optional[Track]
+
+
 class PlaybackStatus:
-    def __init__(self, state: PlaybackState):
-        self.state = state
+    """Holds the playback state and the current track.
+
+    Changes are published on `bus` as the ``playback`` and ``track`` fields.
+    """
+
+    __slots__ = ("_state", "_track", "bus")
+
+    def __init__(self, state: Optional[PlaybackState] = None, bus: Optional[ChangeBus] = None):
+        self._state = state
+        self._track = None
+        self.bus = bus or ChangeBus()
+
+    @property
+    def state(self) -> Optional[PlaybackState]:
+        return self._state
+
+    @state.setter
+    def state(self, value: PlaybackState):
+        if self._state != value:
+            old, self._state = self._state, value
+            self.bus.publish("playback", old, value)
+
+    @property
+    def track(self) -> Optional[Track]:
+        return self._track
+
+    @track.setter
+    def track(self, value: Track):
+        if self._track != value:
+            old, self._track = self._track, value
+            self.bus.publish("track", old, value)
+
+    def snapshot(self) -> PlaybackSnapshot:
+        return PlaybackSnapshot(self._state, self._track)
+
+
+class StatusSnapshot(NamedTuple):
+    """Immutable copy of a :class:`ControllerStatus`."""
+
+    volume: Optional[VolumeSnapshot]
+    playback: Optional[PlaybackSnapshot]
 
 
 class ControllerStatus:
     """Holds last known status of the controller
 
-    This should only be modified by the controller
+    This should only be modified by the controller.
+    Every change to the volume or playback status is published on :attr:`changes`.
+    :meth:`snapshot` returns an immutable copy, which can be read from other tasks or threads as it is.
     """
 
+    __slots__ = ("changes", "volume", "playback")
+
     def __init__(self, volume: Optional[VolumeStatus] = None, playback: Optional[PlaybackStatus] = None):
+        self.changes = ChangeBus()
         self.volume = volume
         self.playback = playback
+        for status in (volume, playback):
+            if status is not None:
+                status.bus = self.changes
+
+    def snapshot(self) -> StatusSnapshot:
+        volume, playback = self.volume, self.playback
+        return StatusSnapshot(
+            volume.snapshot() if volume is not None else None, playback.snapshot() if playback is not None else None
+        )
+
+
+class StatusCache:
+    """Tells whether the last known value of a status field can be used, and shares the queries refreshing it.
+
+    A field is fresh for its time to live, from `ttl` or `default_ttl`, after the controller last heard about it, see
+    :meth:`refresh`. When it isn't, :meth:`ensure_fresh` runs a query, and every caller asking meanwhile waits for
+    that same query instead of sending its own.
+    """
+
+    def __init__(self, ttl: Optional[Dict[str, float]] = None, default_ttl: float = 1):
+        self.ttl = dict(ttl or {})
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._refreshed: Dict[str, float] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._queries: Dict[Hashable, asyncio.Future] = {}
+
+    def refresh(self, *fields: str):
+        """Marks the fields as just heard about, whether their value changed or not."""
+        now = time.monotonic()
+        for field in fields:
+            self._refreshed[field] = now
+            for waiter in self._waiters.pop(field, ()):
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def invalidate(self):
+        self._refreshed.clear()
+
+    def is_fresh(self, field: str) -> bool:
+        refreshed = self._refreshed.get(field)
+        return refreshed is not None and time.monotonic() - refreshed < self.ttl.get(field, self.default_ttl)
+
+    def refreshed(self, field: str) -> asyncio.Future:
+        """Returns a future resolved the next time the field is refreshed.
+
+        Get it before sending the query, so the answer can't be missed.
+        """
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(field, []).append(waiter)
+        return waiter
+
+    async def ensure_fresh(self, field: str, query: Callable[[], Awaitable], key: Optional[Hashable] = None):
+        """Runs `query` unless the field is fresh.
+
+        Queries are shared by `key`, which defaults to the field. Use the same key for fields refreshed by the same query.
+        """
+        if self.is_fresh(field):
+            self.hits += 1
+            return
+        self.misses += 1
+
+        key = field if key is None else key
+        task = self._queries.get(key)
+        if task is None:
+            task = self._queries[key] = asyncio.ensure_future(query())
+            task.add_done_callback(lambda _: self._queries.pop(key, None))
+        await asyncio.shield(task)
 
 
 class Controller:
@@ -88,6 +361,7 @@ class Controller:
     The controller is asynchronous,
     so it's not possible to return the exact status of the device at the time of the function call.
     The implementation should probably manage some sort of internal "cache" / last known good status.
+    :class:`StatusCache` helps with that.
 
     Volume goes from min = 0 to max = 100
     """
@@ -98,6 +372,10 @@ class Controller:
     async def disconnect(self):
         raise NotImplementedError
 
+    async def wait_disconnected(self):
+        """Returns once the connection to the device is lost, or immediately if it isn't connected."""
+        raise NotImplementedError
+
     async def __aenter__(self):
         raise NotImplementedError
 
@@ -107,7 +385,12 @@ class Controller:
     async def get_volume(self) -> int:
         raise NotImplementedError
 
-    async def set_volume(self, value: int):
+    async def set_volume(self, value: int, timestamp: Optional[float] = None):
+        """Sets the volume.
+
+        `timestamp` is the :func:`time.monotonic` time of the change that led to this call, if any. It's used to measure
+        the latency until the device confirms the change.
+        """
         raise NotImplementedError
 
     async def get_mute(self) -> bool:
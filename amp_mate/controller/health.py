@@ -0,0 +1,80 @@
+"""Notices dead connections, such as a half-open TCP connection to an amp gateway, without polling the device."""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Declares a connection dead when nothing was received from it for `deadline` seconds.
+
+    Any received traffic proves the connection is alive, see :meth:`alive`. Only when it's been idle for a while is
+    `probe` called, to make the device send something, e.g. by asking for its power state. The idle interval adapts to
+    the time the device takes to answer: the probe is sent early enough for its answer to arrive before the deadline.
+    The answer time is estimated like TCP's retransmission timeout, from a smoothed round-trip time and its variation.
+    """
+
+    def __init__(self, probe: Callable[[], Optional[Awaitable]], deadline: float = 10, min_timeout: float = 0.1):
+        if deadline <= 2 * min_timeout:
+            raise ValueError("Got invalid deadline %s. Should be more than %s." % (deadline, 2 * min_timeout))
+        self.deadline = deadline
+        self.min_timeout = min_timeout
+        self.last_seen = time.monotonic()
+        self.probes = 0
+        self.rtt: Optional[float] = None
+        self._rtt_var = 0.0
+        self._probe = probe
+        self._seen: Optional[asyncio.Event] = None
+
+    def alive(self):
+        """Records that something was just received."""
+        self.last_seen = time.monotonic()
+        if self._seen:
+            self._seen.set()
+
+    @property
+    def probe_timeout(self) -> float:
+        """How long an answer to the probe may take, between `min_timeout` and half the deadline."""
+        if self.rtt is None:
+            return self.deadline / 2
+        return min(max(self.rtt + 4 * self._rtt_var, self.min_timeout), self.deadline / 2)
+
+    @property
+    def idle_interval(self) -> float:
+        """How long the connection may be idle before it's probed."""
+        return self.deadline - self.probe_timeout
+
+    def _update_rtt(self, sample: float):
+        if self.rtt is None:
+            self.rtt, self._rtt_var = sample, sample / 2
+        else:
+            self._rtt_var = 0.75 * self._rtt_var + 0.25 * abs(self.rtt - sample)
+            self.rtt = 0.875 * self.rtt + 0.125 * sample
+
+    async def run(self):
+        """Watches the connection and returns once it's dead."""
+        self._seen = asyncio.Event()
+        self.last_seen = time.monotonic()
+        while True:
+            idle = self.last_seen + self.idle_interval - time.monotonic()
+            if idle > 0:
+                await asyncio.sleep(idle)
+                continue
+
+            sent = time.monotonic()
+            self._seen.clear()
+            self.probes += 1
+            try:
+                result = self._probe()
+                if result is not None:
+                    await result
+                await asyncio.wait_for(self._seen.wait(), timeout=max(self.last_seen + self.deadline - sent, 0))
+            except asyncio.TimeoutError:
+                logger.warning("Nothing received for %ss, the connection is dead." % self.deadline)
+                return
+            except Exception as e:
+                logger.warning("Failed to probe the connection: %s" % e)
+                return
+            self._update_rtt(self.last_seen - sent)
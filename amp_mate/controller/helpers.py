@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NOTHING = object()
+
+
+def response_splitter(response: bytes, separator: bytes = b"=", end: bytes = b"$") -> Tuple[bytes, bytes]:
+    """Splits a single response of the form ``param=value$`` into its parameter and value.
+
+    The terminator is optional. If there is no separator, the value is empty.
+    """
+    if response.endswith(end):
+        response = response[: -len(end)]
+    param, _, value = response.partition(separator)
+    return param, value
+
+
+class FrameBuffer:
+    """Accumulates bytes received from a stream and splits them into ``param=value`` frames.
+
+    Frames end with `end`. A frame split across several reads is kept until its end arrives and all the frames
+    received in one chunk are returned at once.
+
+    Frames are located in place in the buffer, which is only compacted once per :meth:`feed` call,
+    so a burst of frames doesn't cost a decode and a split per frame.
+
+    A partial frame longer than `max_size` is garbage, e.g. line noise, and is dropped rather than kept waiting for an
+    end that may never come. :attr:`dropped` counts the dropped bytes.
+    """
+
+    def __init__(self, end: bytes = b"$", separator: bytes = b"=", max_size: int = 1024):
+        if not end:
+            raise ValueError("The frame terminator can't be empty.")
+        self._end = end
+        self._separator = separator
+        self._max_size = max_size
+        self._buffer = bytearray()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        """Number of bytes waiting for the end of their frame."""
+        return len(self._buffer)
+
+    def clear(self):
+        self._buffer.clear()
+
+    def feed(self, data: bytes) -> List[Tuple[bytes, bytes]]:
+        """Adds `data` to the buffer and returns the `(param, value)` pairs of every complete frame."""
+        buffer = self._buffer
+        buffer += data
+        end, separator = self._end, self._separator
+        end_len, sep_len = len(end), len(separator)
+
+        frames = []
+        start = 0
+        with memoryview(buffer) as view:
+            while True:
+                stop = buffer.find(end, start)
+                if stop < 0:
+                    break
+                split = buffer.find(separator, start, stop)
+                if split < 0:
+                    frames.append((bytes(view[start:stop]), b""))
+                else:
+                    frames.append((bytes(view[start:split]), bytes(view[split + sep_len : stop])))
+                start = stop + end_len
+
+        if start:
+            del buffer[:start]
+        if len(buffer) > self._max_size:
+            logger.warning("Dropping %i bytes without a frame end.", len(buffer))
+            self.dropped += len(buffer)
+            buffer.clear()
+        return frames
+
+
+class Coalescer:
+    """Forwards values to `send`, keeping only the latest one while the previous send is in progress.
+
+    This is meant for values such as a target volume, where only the last one matters: when they come in faster than
+    the receiving end can handle, the intermediate values are dropped. :attr:`merged` counts them.
+
+    At most `max_rate` values are sent per second. If it's ``None``, the rate is only limited by `send`.
+    """
+
+    def __init__(self, send: Callable[[Any], Awaitable], max_rate: Optional[float] = None):
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError("Got invalid rate %s. Should be positive." % max_rate)
+        self.max_rate = max_rate
+        self.sent = 0
+        self.merged = 0
+        self._send = send
+        self._value = _NOTHING
+        self._pending = None
+        self._task = None
+
+    def push(self, value: Any):
+        """Sets the value to send, replacing the one waiting to be sent if any."""
+        if self._value is not _NOTHING:
+            self.merged += 1
+        self._value = value
+        if self._pending:
+            self._pending.set()
+
+    def start(self):
+        self._pending = asyncio.Event()
+        if self._value is not _NOTHING:
+            self._pending.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            value, self._value = self._value, _NOTHING
+
+            started = loop.time()
+            try:
+                await self._send(value)
+            except Exception:
+                logger.exception("Failed to send %r." % value)
+            else:
+                self.sent += 1
+
+            if self.max_rate:
+                delay = 1 / self.max_rate - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
@@ -0,0 +1,254 @@
+"""In-memory metrics, served over HTTP in the Prometheus text format.
+
+Metrics are registered in a :class:`Registry`, by default :data:`REGISTRY`, and are identified by their name and
+labels. :class:`MetricsServer` exposes a registry on ``/metrics``.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        return [_sample(name, labels, self.value)]
+
+
+class Gauge:
+    """A value that can go up and down. If `function` is given, it's called for the value on every scrape."""
+
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self._value = 0
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        return self._function() if self._function else self._value
+
+    def set(self, value: float):
+        self._value = value
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        return [_sample(name, labels, self.value)]
+
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.25, 0.5, 1, 2.5, 5, 10)
+    """Bucket upper bounds, in seconds."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            samples.append(_sample(name + "_bucket", labels + (("le", _format_value(bound)),), cumulative))
+        samples.append(_sample(name + "_bucket", labels + (("le", "+Inf"),), self.count))
+        samples.append(_sample(name + "_count", labels, self.count))
+        samples.append(_sample(name + "_sum", labels, self.sum))
+        return samples
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '%s="%s"' % (key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels
+    )
+    return "{%s}" % ",".join(escaped)
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    return "%s%s %s" % (name, _format_labels(labels), _format_value(value))
+
+
+class Registry:
+    """Holds metrics by name. A name has a single type, and one metric per set of labels."""
+
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, Dict[Labels, object]]] = OrderedDict()
+
+    def _get(self, kind: str, name: str, documentation: str, factory: Callable, labels: Dict[str, str]):
+        family = self._families.setdefault(name, (kind, documentation, OrderedDict()))
+        if family[0] != kind:
+            raise ValueError("Metric %s is already registered as a %s." % (name, family[0]))
+        key = tuple(sorted((key, str(value)) for key, value in labels.items()))
+        metrics = family[2]
+        if key not in metrics:
+            metrics[key] = factory()
+        return metrics[key]
+
+    def counter(self, name: str, documentation: str, **labels: str) -> Counter:
+        return self._get("counter", name, documentation, Counter, labels)
+
+    def gauge(
+        self, name: str, documentation: str, function: Optional[Callable[[], float]] = None, **labels: str
+    ) -> Gauge:
+        return self._get("gauge", name, documentation, lambda: Gauge(function), labels)
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS, **labels: str
+    ) -> Histogram:
+        return self._get("histogram", name, documentation, lambda: Histogram(buckets), labels)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, documentation, metrics) in self._families.items():
+            lines.append("# HELP %s %s" % (name, documentation))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, metric in metrics.items():
+                lines.extend(metric.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+"""The registry used by default."""
+
+
+class SpanTracker:
+    """Measures the time between an event and its confirmation, matched by a key.
+
+    A span is opened with the time of the event, from :func:`time.monotonic`, and closed when the confirmation with the
+    same key is seen. Its duration is then observed in `histogram`. If a span is already open for the key, the earlier
+    time is kept. At most `max_open` spans are kept, the oldest is dropped when there are more.
+    """
+
+    def __init__(self, histogram: Histogram, max_open: int = 100):
+        self.histogram = histogram
+        self.max_open = max_open
+        self.dropped = 0
+        self._open: Dict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def open(self, key: Hashable, timestamp: float):
+        if key in self._open:
+            return
+        if len(self._open) >= self.max_open:
+            self._open.popitem(last=False)
+            self.dropped += 1
+        self._open[key] = timestamp
+
+    def close(self, key: Hashable) -> Optional[float]:
+        """Closes the span for `key` if there's one and returns its duration."""
+        started = self._open.pop(key, None)
+        if started is None:
+            return None
+        duration = time.monotonic() - started
+        self.histogram.observe(duration)
+        return duration
+
+    def clear(self):
+        self._open.clear()
+
+
+def volume_latency_tracker(controller: object, registry: Optional[Registry] = None) -> SpanTracker:
+    """Returns a tracker for the volume changes sent to `controller`, until the device confirms them."""
+    histogram = (registry or REGISTRY).histogram(
+        "amp_mate_volume_latency_seconds",
+        "Time from a volume change at its source to its confirmation by the device.",
+        controller=str(controller),
+    )
+    return SpanTracker(histogram)
+
+
+def mute_latency_tracker(controller: object, registry: Optional[Registry] = None) -> SpanTracker:
+    """Returns a tracker for the mute commands sent to `controller`, until the device reports it's muted."""
+    histogram = (registry or REGISTRY).histogram(
+        "amp_mate_mute_latency_seconds",
+        "Time from a mute command to its confirmation by the device.",
+        controller=str(controller),
+    )
+    return SpanTracker(histogram)
+
+
+def time_to_ready_gauge(controller: object, registry: Optional[Registry] = None) -> Gauge:
+    """Returns the gauge of the time `controller` took to be ready, from the start of its last connection."""
+    return (registry or REGISTRY).gauge(
+        "amp_mate_time_to_ready_seconds",
+        "Time from the start of the connection to the device's full state being read.",
+        controller=str(controller),
+    )
+
+
+class MetricsServer:
+    """Serves a registry on ``/metrics`` over HTTP, in the Prometheus text format.
+
+    This is a minimal HTTP/1.0 server meant for a local scraper, every connection serves a single request.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "127.0.0.1", port: int = 9745):
+        self.registry = registry
+        self._host = host
+        self._port = port
+        self._srv = None
+
+    @property
+    def port(self) -> int:
+        if self._srv and self._srv.sockets:
+            return self._srv.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self):
+        self._srv = await asyncio.start_server(self._handle_connection, host=self._host, port=self._port)
+        logger.info("Serving metrics on http://%s:%s/metrics" % (self._host, self.port))
+
+    async def stop(self):
+        if self._srv:
+            self._srv.close()
+            await self._srv.wait_closed()
+            self._srv = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        method, _, rest = request.partition(b" ")
+        path = rest.split(b" ", 1)[0].split(b"?", 1)[0]
+        if method == b"GET" and path == b"/metrics":
+            status, body = "200 OK", self.registry.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+
+        header = "HTTP/1.0 %s\r\nContent-Type: %s\r\nContent-Length: %s\r\n\r\n"
+        header %= (status, self.CONTENT_TYPE, len(body))
+        writer.writelines([header.encode(), body])
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
@@ -0,0 +1,37 @@
+"""Plans volume ramps, for fades and smooth changes.
+
+A ramp goes from one device volume to another in steps spread evenly over its duration. Each step is sent with the
+cheapest encoding: the absolute volume or a number of relative steps, whichever takes fewer bytes on the wire.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+
+def plan_ramp(start: int, end: int, duration: float, max_rate: float) -> List[Tuple[float, int]]:
+    """Returns the steps from `start` to `end` as :code:`(delay, volume)`, the delay being from the ramp's start.
+
+    There are at most `max_rate` steps per second, and at least one step, the last one setting `end` after `duration`.
+    """
+    if duration < 0 or max_rate <= 0:
+        raise ValueError("Got invalid duration %s or rate %s." % (duration, max_rate))
+    delta = end - start
+    if not delta:
+        return []
+    count = max(1, min(abs(delta), int(duration * max_rate)))
+    return [(duration * step / count, start + round(delta * step / count)) for step in range(1, count + 1)]
+
+
+def cheapest_encoding(
+    current: Optional[int], target: int, absolute: Sequence[bytes], up: bytes, down: bytes, offset: int = 0
+) -> List[bytes]:
+    """Returns the messages setting the volume from `current` to `target` in the fewest bytes.
+
+    `absolute` holds the message setting each volume, from `offset`. `up` and `down` are the relative steps, they're
+    only used if `current` is known and they're strictly cheaper, the absolute volume being safer.
+    """
+    best = [absolute[target - offset]]
+    if current is None or current == target:
+        return best if current is None else []
+    step = up if target > current else down
+    if abs(target - current) * len(step) < len(best[0]):
+        return [step] * abs(target - current)
+    return best
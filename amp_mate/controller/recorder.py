@@ -0,0 +1,108 @@
+"""Records the traffic between the controllers and their devices, so sessions can be replayed later.
+
+The log is an append-only binary file: a header, then one record per message, made of its direction, its
+:func:`time.monotonic` timestamp and its payload. Rotel payloads are the raw bytes, Volumio ones are the event and its
+data, as JSON. See :mod:`benchmarks.replay` to replay a log into a simulator.
+
+Every :class:`Recorder` starts with a :attr:`~Direction.SESSION` record. The timestamps of different sessions can't be
+compared, the monotonic clock restarts with the machine, so each session is replayed on its own timeline.
+"""
+import json
+import struct
+import time
+from enum import IntEnum
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional, Union
+
+MAGIC = b"AMPREC1\n"
+
+_HEADER = struct.Struct("<BdI")
+"""Direction, timestamp and payload length of a record."""
+
+
+class Direction(IntEnum):
+    SENT = 0
+    """From the controller to the device."""
+    RECEIVED = 1
+    """From the device to the controller."""
+    SESSION = 2
+    """Not a message, marks the start of a recording session. Its payload is empty."""
+
+
+class Record(NamedTuple):
+    direction: Direction
+    timestamp: float
+    payload: bytes
+
+
+def encode_event(event: str, data: Any = None) -> bytes:
+    return json.dumps([event, data], separators=(",", ":")).encode()
+
+
+def decode_event(payload: bytes) -> tuple:
+    event, data = json.loads(payload.decode())
+    return event, data
+
+
+class Recorder:
+    """Appends records to a log file, after a session record. The file is created with its header if it doesn't exist.
+
+    Records are buffered, they're written when the buffer fills up and on :meth:`flush` or :meth:`close`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file: Optional[BinaryIO] = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._file.write(_HEADER.pack(Direction.SESSION, time.monotonic(), 0))
+
+    def record(self, direction: Direction, payload: bytes, timestamp: Optional[float] = None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._file.write(_HEADER.pack(direction, timestamp, len(payload)))
+        self._file.write(payload)
+        self.count += 1
+
+    def record_event(self, direction: Direction, event: str, data: Any = None):
+        self.record(direction, encode_event(event, data))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_records(source: Union[str, BinaryIO]) -> Iterator[Record]:
+    """Yields the records of a log, given as a path or a binary file.
+
+    Raises:
+        ValueError: If it isn't a log, or if it's truncated.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            yield from read_records(file)
+        return
+
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a traffic log.")
+    while True:
+        header = source.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size:
+            raise ValueError("Truncated traffic log.")
+        direction, timestamp, length = _HEADER.unpack(header)
+        payload = source.read(length)
+        if len(payload) < length:
+            raise ValueError("Truncated traffic log.")
+        yield Record(Direction(direction), timestamp, payload)
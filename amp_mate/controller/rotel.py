@@ -1,7 +1,21 @@
 import asyncio
+import logging
+import time
 from asyncio import AbstractEventLoop
 from enum import Enum
-from typing import Iterable, Optional
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from .base_controller import ChangeBus, Controller, ControllerException, StatusCache
+from .helpers import FrameBuffer, response_splitter
+from .metrics import mute_latency_tracker, time_to_ready_gauge, volume_latency_tracker
+from .ramp import cheapest_encoding, plan_ramp
+from .health import HealthMonitor
+from .recorder import Direction, Recorder
+from .scheduler import CommandScheduler, Priority
+from .transport import TcpTransport, Transport
+from .volume_map import Curve, VolumeMap, linear
+
+logger = logging.getLogger(__name__)
 
 
 class RotelStatusException(Exception):
@@ -21,6 +35,11 @@ class RotelToneConfig:
 
 
 class RotelConfigBase:
+    """Describes a Rotel amp model.
+
+    `volume_curve` maps the normalised volume to the amp's volume. See :mod:`~.volume_map`.
+    """
+
     def __init__(
         self,
         min_volume: int,
@@ -33,9 +52,12 @@ class RotelConfigBase:
         separator: str = "=",
         recv_end: str = "$",
         send_end: str = "!",
+        request_end: str = "?",
+        volume_curve: Curve = linear,
     ):
         self.min_volume = min_volume
         self.max_volume = max_volume
+        self.volume_map = VolumeMap(min_volume, max_volume, volume_curve)
         self.sources = sources
         self.source_control = source_control
         self.speakers = speakers
@@ -44,6 +66,7 @@ class RotelConfigBase:
         self.separator = separator
         self.recv_end = recv_end
         self.send_end = send_end
+        self.request_end = request_end
 
 
 class RotelPower(Enum):
@@ -51,27 +74,164 @@ class RotelPower(Enum):
     OFF = False
 
 
+def _on_off(value: bytes) -> bool:
+    return value == b"on"
+
+
+def _balance(value: bytes) -> int:
+    """Balance is sent as ``L05``, ``R05`` or ``000``. Left is negative."""
+    if value[:1] == b"L":
+        return -int(value[1:])
+    if value[:1] == b"R":
+        return int(value[1:])
+    return int(value)
+
+
+def _frequency(value: bytes) -> Optional[float]:
+    return None if value == b"off" else float(value)
+
+
+def _speakers(value: bytes) -> Tuple[str, ...]:
+    return () if value == b"off" else tuple(value.decode().split("_"))
+
+
+class RotelSnapshot(NamedTuple):
+    """Immutable copy of a :class:`RotelStatus`."""
+
+    power: Optional[RotelPower]
+    source: Optional[str]
+    volume: Optional[int]
+    mute: Optional[bool]
+    bypass: Optional[bool]
+    bass: Optional[int]
+    treble: Optional[int]
+    balance: Optional[int]
+    input_frequency: Optional[float]
+    speakers: Optional[Tuple[str, ...]]
+    dimmer: Optional[int]
+    version: Optional[str]
+    model: Optional[str]
+
+
 class RotelStatus:
-    def __init__(self, config: RotelConfigBase):
+    """Holds the last known status of the amp, as reported by it.
+
+    Every change reported by the amp is published on :attr:`changes`, with the attribute's name as the field, e.g.
+    ``power`` or ``mute``. Like the other controllers, the ``volume`` changes are published normalised, see
+    :class:`~.volume_map.VolumeMap`, so they can be linked to another controller's volume.
+    """
+
+    __slots__ = (
+        "_config",
+        "changes",
+        "power",
+        "source",
+        "_volume",
+        "mute",
+        "bypass",
+        "bass",
+        "treble",
+        "balance",
+        "tone_config",
+        "input_frequency",
+        "speakers",
+        "dimmer",
+        "version",
+        "model",
+    )
+
+    _FIELDS: Dict[bytes, Tuple[str, Callable[[bytes], object]]] = {
+        b"power": ("power", lambda value: RotelPower(value == b"on")),
+        b"source": ("source", bytes.decode),
+        b"volume": ("volume", int),
+        b"mute": ("mute", _on_off),
+        b"bypass": ("bypass", _on_off),
+        b"bass": ("bass", int),
+        b"treble": ("treble", int),
+        b"balance": ("balance", _balance),
+        b"freq": ("input_frequency", _frequency),
+        b"speaker": ("speakers", _speakers),
+        b"dimmer": ("dimmer", int),
+        b"version": ("version", bytes.decode),
+        b"model": ("model", bytes.decode),
+    }
+    """Map of the form :code:`param: (attribute, parser)`. The parser converts the raw value sent by the amp."""
+
+    def __init__(self, config: RotelConfigBase, changes: Optional[ChangeBus] = None):
         self._config = config
+        self.changes = changes or ChangeBus()
         self.power: Optional[RotelPower] = None
         self.source: Optional[str] = None
-        self.volume: Optional[int] = None
+        self._volume: Optional[int] = None
         self.mute: Optional[bool] = None
+        self.bypass: Optional[bool] = None
+        self.bass: Optional[int] = None
+        self.treble: Optional[int] = None
+        self.balance: Optional[int] = None
         self.tone_config: Optional[RotelToneConfig] = None
-        self.input_frequency: Optional[int] = None
-        self.speakers: Optional[Iterable[str]] = None
-        self.dimmer = Optional[int] = None
+        self.input_frequency: Optional[float] = None
+        self.speakers: Optional[Tuple[str, ...]] = None
+        self.dimmer: Optional[int] = None
         self.version: Optional[str] = None
         self.model: Optional[str] = None
 
     def update_status(self, amp_response: str) -> bool:
         """Updates the status from a message received from the amp and returns whether something changed."""
-        param, value = response_splitter(amp_response, separator=self._config.separator, end=self._config.recv_end)
+        param, value = response_splitter(
+            amp_response.encode(), separator=self._config.separator.encode(), end=self._config.recv_end.encode()
+        )
+        return self.update_field(param, value)
+
+    def update_field(self, param: bytes, value: bytes) -> bool:
+        """Updates the field corresponding to `param` from its raw value and returns whether something changed.
+
+        Unknown parameters are ignored.
+
+        Raises:
+            RotelStatusException: If the value can't be understood.
+        """
+        try:
+            attr, parser = self._FIELDS[param]
+        except KeyError:
+            logger.debug("Ignoring unknown parameter %r.", param)
+            return False
+
+        try:
+            new_value = parser(value)
+        except ValueError as e:
+            raise RotelStatusException("Invalid value %r for %r." % (value, param)) from e
+
+        old_value = getattr(self, attr)
+        if old_value == new_value:
+            return False
+        setattr(self, attr, new_value)
+        if attr == "volume":
+            volume_map = self._config.volume_map
+            old_value = volume_map.from_device(old_value) if old_value is not None else None
+            new_value = volume_map.from_device(new_value)
+        self.changes.publish(attr, old_value, new_value)
         return True
 
+    def snapshot(self) -> RotelSnapshot:
+        """Returns an immutable copy of the status, which can be read from other tasks or threads as it is."""
+        return RotelSnapshot(
+            self.power,
+            self.source,
+            self._volume,
+            self.mute,
+            self.bypass,
+            self.bass,
+            self.treble,
+            self.balance,
+            self.input_frequency,
+            self.speakers,
+            self.dimmer,
+            self.version,
+            self.model,
+        )
+
     @property
-    def volume(self) -> int:
+    def volume(self) -> Optional[int]:
         return self._volume
 
     @volume.setter
@@ -85,27 +245,464 @@ class RotelStatus:
                 )
 
 
-class RotelController:
+class RotelController(Controller):
     """Encapsulates a protocol to communicate with Rotel RS232 V2 capable amps.
 
     This class uses asyncio to communicate with the amp. It is NOT thread-safe!
     """
 
-    def __init__(self, host: str, port: int, config: RotelConfigBase, loop: Optional[AbstractEventLoop] = None):
+    READ_SIZE = 4096
+    QUERY_TIMEOUT = 2
+    ACK_TIMEOUT = 1
+    """Longest :meth:`set_volume` waits for the amp to report the new volume, in seconds."""
+    MAX_BATCH_TIME = 0.05
+    """Longest a batch of commands may keep a limited link busy, in seconds. See :meth:`_write_commands`."""
+
+    _PRIORITIES = {
+        "power": Priority.SAFETY,
+        "mute": Priority.SAFETY,
+        "vol": Priority.VOLUME,
+        "bass": Priority.VOLUME,
+        "treble": Priority.VOLUME,
+        "balance": Priority.VOLUME,
+    }
+    """Priority of the commands by name, e.g. ``vol`` for ``vol_up``. Sources have :attr:`~.Priority.SOURCE` and other
+    commands :attr:`~.Priority.NORMAL`. Requests have :attr:`~.Priority.REQUEST`."""
+    MAX_RAMP_RATE = 20
+    """Most volume steps per second sent by a ramp. On a limited link, a ramp also uses at most half of it."""
+
+    _RELATIVE = frozenset(["up", "dwn", "down", "l", "r"])
+    """Arguments of the volume and tone commands that change the value by a step instead of setting it."""
+
+    _ATTRS = {param: attr for param, (attr, _) in RotelStatus._FIELDS.items()}
+
+    def __init__(
+        self,
+        host: Optional[str],
+        port: Optional[int],
+        config: RotelConfigBase,
+        loop: Optional[AbstractEventLoop] = None,
+        cache_ttl: Optional[Dict[str, float]] = None,
+        bootstrap: bool = True,
+        transport: Optional[Transport] = None,
+        recorder: Optional[Recorder] = None,
+        health_deadline: Optional[float] = 10,
+    ):
+        """The amp is reached over TCP at `host` and `port`, unless another `transport` is given, such as a
+        :class:`~.transport.SerialTransport`. Then `host` and `port` aren't used.
+
+        If a `recorder` is given, everything sent to and received from the amp is recorded.
+
+        The connection is considered lost when nothing is received from the amp for `health_deadline` seconds, see
+        :class:`~.health.HealthMonitor`. The amp is only asked for its power state when it's been quiet for a while.
+        ``None`` disables it, then a half-open connection is only noticed when the OS gives up on it.
+        """
         self.host = host
         self.port = port
+        self.transport = transport or TcpTransport(host, port)
         self.config = config
+        self.bootstrap = bootstrap
+        self.recorder = recorder
+        self.health_deadline = health_deadline
+        self.health: Optional[HealthMonitor] = None
+        self.is_ready = False
+        self._auto_update = False
+        self.time_to_ready: Optional[float] = None
+        self.status = RotelStatus(config)
+        self._cache = StatusCache(cache_ttl)
+        self._volume_spans = volume_latency_tracker(self)
+        self._mute_spans = mute_latency_tracker(self)
+        self._ready_gauge = time_to_ready_gauge(self)
         self._reader = self._writer = None
+        self._read_task = self._write_task = self._health_task = None
         self._loop = loop
+        self._send_end = config.send_end.encode()
+        self._request_end = config.request_end.encode()
+        self._encoded: Dict[Tuple[str, bytes], bytes] = {}
+        self._queries: Dict[bytes, asyncio.Future] = {}
+        self._scheduling: Dict[str, Tuple[Priority, Optional[str], bool]] = {}
+        self._outgoing = CommandScheduler()
+        self._outgoing_ready = None
+        # `vol_00` isn't accepted, the lowest volume is set with `vol_min`
+        self._volume_commands = ("vol_min",) + tuple(
+            "vol_%02i" % value for value in range(config.min_volume + 1, config.max_volume + 1)
+        )
+        self._ramp_task: Optional[asyncio.Future] = None
+        self._ramp_volume: Optional[int] = None
+        self._target_volume: Optional[int] = None
+        self._faded_volume: Optional[int] = None
 
     async def connect(self):
-        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, loop=self._loop)
+        """Connects to the amp and, if `bootstrap` is set, reads its full state. See :meth:`_bootstrap`.
+
+        If the bootstrap fails or is cancelled, e.g. by a timeout, the connection is closed and the tasks are stopped.
+        """
+        started = time.monotonic()
+        # Streams always use the running loop, `loop` was removed from `open_connection` in Python 3.10.
+        self._reader, self._writer = await self.transport.open()
+        self._outgoing_ready = asyncio.Event()
+        if self._outgoing:
+            self._outgoing_ready.set()
+        self._read_task = asyncio.ensure_future(self._read_responses(), loop=self._loop)
+        self._write_task = asyncio.ensure_future(self._write_commands(), loop=self._loop)
+        if self.health_deadline is not None:
+            self.health = HealthMonitor(lambda: self.send_request("power"), self.health_deadline)
+            self._health_task = asyncio.ensure_future(self._watch_health(), loop=self._loop)
+        if self.bootstrap:
+            try:
+                await self._bootstrap(started)
+            except BaseException:
+                await self.disconnect()
+                raise
+
+    async def _bootstrap(self, started: float):
+        """Turns on auto update and asks for every status parameter, all in one go.
+
+        The controller is ready once every parameter is answered. The time since `started` is kept in
+        :attr:`time_to_ready` and in the ``amp_mate_time_to_ready_seconds`` gauge. A parameter that isn't answered is
+        logged and the controller isn't marked ready.
+        """
+        self.send_command("rs232_update_on")
+        params = [param.decode() for param in RotelStatus._FIELDS]
+        results = await asyncio.gather(*(self.query(param) for param in params), return_exceptions=True)
+        failed = [param for param, result in zip(params, results) if isinstance(result, Exception)]
+        if failed:
+            logger.warning("%s didn't answer %s, it's not ready." % (self, ", ".join(failed)))
+            return
+
+        self.is_ready = True
+        self.time_to_ready = time.monotonic() - started
+        self._ready_gauge.set(self.time_to_ready)
+        logger.info("%s ready in %.1fms." % (self, 1000 * self.time_to_ready))
 
     async def disconnect(self):
-        self._writer.close()
-        await self._writer.wait_closed()
+        self.cancel_ramp()
+        self._target_volume = None
+        for task in (self._read_task, self._write_task, self._health_task):
+            if task:
+                task.cancel()
+        self._read_task = self._write_task = self._health_task = None
+        self.is_ready = False
+        self._auto_update = False
+        self._cache.invalidate()
+        self._volume_spans.clear()
+        self._mute_spans.clear()
+        for future in self._queries.values():
+            if not future.done():
+                future.set_exception(ControllerException("Disconnected from %s." % self))
+        self._queries.clear()
+        if self._writer:
+            self._writer.close()
+            await self._writer.wait_closed()
         self._writer = self._reader = None
 
+    async def wait_disconnected(self):
+        """Returns once the amp closes the connection or it's found dead. The read task ends then."""
+        if self._read_task:
+            await asyncio.wait([self._read_task])
+
+    async def _watch_health(self):
+        """Ends the read task once the connection is found dead, so it's reconnected like a closed one."""
+        await self.health.run()
+        logger.warning("%s stopped answering." % self)
+        if self._read_task:
+            self._read_task.cancel()
+
+    def __str__(self):
+        return "Rotel at %s" % self.transport
+
+    async def _read_responses(self):
+        """Reads everything the amp sends and updates the status.
+
+        A single read may hold several responses, or only part of one. See :class:`~.helpers.FrameBuffer`.
+        """
+        frames = FrameBuffer(end=self.config.recv_end.encode(), separator=self.config.separator.encode())
+        while True:
+            try:
+                data = await self._reader.read(self.READ_SIZE)
+            # A serial device going away raises other errors than a closed socket, e.g. EIO.
+            except OSError as e:
+                logger.warning("Connection to %s lost: %s" % (self.transport, e))
+                break
+            if not data:
+                logger.info("Connection to %s closed by the amp." % self.transport)
+                break
+            if self.health:
+                self.health.alive()
+            if self.recorder:
+                self.recorder.record(Direction.RECEIVED, data)
+            for param, value in frames.feed(data):
+                self._handle_response(param, value)
+
+    def _handle_response(self, param: bytes, value: bytes):
+        """Updates the status and resolves the query waiting for this parameter, if any."""
+        query = self._queries.pop(param, None)
+        try:
+            if self.status.update_field(param, value):
+                logger.debug("%s changed to %r", param, value)
+        except RotelStatusException as e:
+            logger.warning(e)
+            if query and not query.done():
+                query.set_exception(e)
+            return
+
+        attr = self._ATTRS.get(param)
+        if attr:
+            self._cache.refresh(attr)
+        if param == b"volume":
+            self._volume_spans.close(self.status.volume)
+            if self.status.volume == self._target_volume:
+                self._target_volume = None
+        elif param == b"mute" and self.status.mute:
+            self._mute_spans.close(True)
+        if query and not query.done():
+            query.set_result(getattr(self.status, attr) if attr else value.decode())
+
+    async def query(self, param: str):
+        """Asks the amp for a parameter, such as ``volume``, and returns its value once answered.
+
+        The value is typed like the corresponding :class:`RotelStatus` attribute. Any number of queries can be in flight
+        at once, each one is resolved by the first response for its parameter, be it the answer or an update. Queries
+        for a parameter that's already being asked for wait for the same answer instead of sending another request.
+
+        Raises:
+            ControllerException: If the amp doesn't answer in time.
+            RotelStatusException: If the answer can't be understood.
+        """
+        key = param.encode()
+        future = self._queries.get(key)
+        if future is None:
+            future = self._queries[key] = asyncio.get_event_loop().create_future()
+            self.send_request(param)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            if self._queries.get(key) is future:
+                del self._queries[key]
+            raise ControllerException("%s didn't answer %s in %ss." % (self, param, self.QUERY_TIMEOUT))
+
+    def reported(self, param: str) -> asyncio.Future:
+        """Returns a future resolved the next time the amp reports `param`, such as ``volume``, changed or not.
+
+        Get it before sending the command, so the report can't be missed.
+        """
+        return self._cache.refreshed(self._ATTRS[param.encode()])
+
+    async def get_volume(self) -> int:
+        await self._cache.ensure_fresh("volume", lambda: self.query("volume"))
+        return self.config.volume_map.from_device(self.status.volume)
+
+    async def get_mute(self) -> bool:
+        await self._cache.ensure_fresh("mute", lambda: self.query("mute"))
+        return self.status.mute
+
+    async def set_volume(self, value: int, timestamp: Optional[float] = None):
+        """Sets the normalised volume.
+
+        Nothing is sent if the volume last commanded, or else the amp's volume, already corresponds to `value`, so
+        echoes of the amp's own changes don't move it. With a `timestamp`, the time until the amp reports the new volume
+        is measured.
+
+        If the amp reports its changes, this returns once it reports the volume, or after :attr:`ACK_TIMEOUT`. A caller
+        sending volumes one after the other, such as a :class:`~.helpers.Coalescer`, is thus paced by the amp and
+        merges the volumes it can't keep up with, instead of piling them up on the way.
+        """
+        current = self._ramp_position()
+        self.cancel_ramp()
+        self._faded_volume = None
+        volume = self.config.volume_map.to_device(value, current=current)
+        if volume == current:
+            return
+        if timestamp is not None:
+            self._volume_spans.open(volume, timestamp)
+        reported = self.reported("volume") if self._auto_update and self._writer else None
+        self.send_command(self._volume_commands[volume - self.config.min_volume])
+        self._target_volume = volume
+        if reported:
+            try:
+                await asyncio.wait_for(reported, timeout=self.ACK_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("%s didn't report its volume in %ss.", self, self.ACK_TIMEOUT)
+                if self._target_volume == volume:
+                    self._target_volume = None
+
+    def ramp_volume(self, value: int, duration: float) -> asyncio.Future:
+        """Ramps to the normalised volume `value` over `duration` seconds, and returns the ramp's task.
+
+        A ramp in progress is cancelled, the new one starts from where it got to. A ramp is also cancelled by
+        :meth:`set_volume`, by a mute or a power off, see :meth:`send_command`, and on disconnection.
+        """
+        return self._start_ramp(self.config.volume_map.to_device(value, current=self._ramp_position()), duration)
+
+    def fade_out(self, duration: float = 1) -> asyncio.Future:
+        """Ramps down to the lowest volume. :meth:`fade_in` brings the volume back to where it was."""
+        if self._faded_volume is None:
+            self._faded_volume = self._ramp_position()
+        return self._start_ramp(self.config.min_volume, duration)
+
+    def fade_in(self, duration: float = 1) -> Optional[asyncio.Future]:
+        """Ramps back up to the volume before :meth:`fade_out`. Does nothing if there was no fade out.
+
+        The volume is kept until the fade in completes, so one interrupted by a mute or another fade out still comes
+        back to it.
+        """
+        if self._faded_volume is None:
+            return None
+        ramp = self._start_ramp(self._faded_volume, duration)
+        ramp.add_done_callback(self._faded_in)
+        return ramp
+
+    def _faded_in(self, ramp: asyncio.Future):
+        if ramp is self._ramp_task and not ramp.cancelled():
+            self._faded_volume = None
+
+    def cancel_ramp(self):
+        if self._ramp_task and not self._ramp_task.done():
+            self._ramp_task.cancel()
+        self._ramp_task = None
+
+    def _ramp_position(self) -> Optional[int]:
+        """The volume last sent by the ramp in progress, or by the last ramp or :meth:`set_volume` until the amp
+        reports it, or else the amp's volume."""
+        if self._ramp_task and not self._ramp_task.done() and self._ramp_volume is not None:
+            return self._ramp_volume
+        if self._target_volume is not None:
+            return self._target_volume
+        return self.status.volume
+
+    def _start_ramp(self, volume: int, duration: float) -> asyncio.Future:
+        start = self._ramp_position()
+        self.cancel_ramp()
+        self._ramp_volume = start
+        self._target_volume = None
+        self._ramp_task = asyncio.ensure_future(self._ramp(start, volume, duration))
+        return self._ramp_task
+
+    async def _ramp(self, start: Optional[int], end: int, duration: float):
+        """Sends the steps of the ramp, each one with the encoding that takes the fewest bytes.
+
+        Absolute steps drop the queued steps they make stale, so a slow link doesn't build a backlog.
+        """
+        absolute = [self._encode(command, self._send_end) for command in self._volume_commands]
+        up, down = self._encode("vol_up", self._send_end), self._encode("vol_dwn", self._send_end)
+        if start is None:
+            steps = [(duration, end)]
+        else:
+            rate = self.MAX_RAMP_RATE
+            if self.transport.byte_rate:
+                rate = min(rate, self.transport.byte_rate / 2 / len(absolute[-1]))
+            steps = plan_ramp(start, end, duration, rate)
+
+        loop = asyncio.get_event_loop()
+        began = loop.time()
+        current = start
+        for delay, volume in steps:
+            wait = began + delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            for message in cheapest_encoding(current, volume, absolute, up, down, offset=self.config.min_volume):
+                self._queue(message, Priority.VOLUME, "vol", message not in (up, down))
+            current = self._ramp_volume = volume
+        if end != self.status.volume:
+            self._target_volume = end
+
+    async def set_mute(self):
+        """Mutes the amp. The time until the amp reports it's muted is measured."""
+        self._mute_spans.open(True, time.monotonic())
+        self.send_command("mute_on")
+
+    async def set_unmute(self):
+        self.send_command("mute_off")
+
+    def send_command(self, command: str):
+        """Queues a command, such as ``vol_up``, to be sent to the amp.
+
+        The terminator is added by the controller. Commands queued while disconnected are sent once connected.
+
+        Commands are sent by priority, see :meth:`_schedule`. An absolute volume or tone command, or a source, drops
+        the queued commands of the same kind it makes stale. Turning the power off drops the queued volume and tone
+        commands.
+
+        Muting or turning the power off also cancels the volume ramp in progress, so a fade doesn't keep changing the
+        volume behind the mute, e.g. to unmute louder than expected. The volume to fade back in to is kept, see
+        :meth:`fade_in`.
+        """
+        priority, group, supersedes = self._schedule(command)
+        if command in ("rs232_update_on", "rs232_update_off"):
+            self._auto_update = command == "rs232_update_on"
+        if command in ("mute_on", "power_off"):
+            self.cancel_ramp()
+        if command == "power_off":
+            self._outgoing.drop(Priority.VOLUME)
+            self._target_volume = None
+        self._queue(self._encode(command, self._send_end), priority, group, supersedes)
+
+    def send_request(self, param: str):
+        """Queues a request for a parameter, such as ``volume``. The amp answers with its value."""
+        self._queue(self._encode(param, self._request_end), Priority.REQUEST)
+
+    def _schedule(self, command: str) -> Tuple[Priority, Optional[str], bool]:
+        """Returns the priority of the command, its group and whether it supersedes the queued commands of its group.
+
+        Like encodings, these are computed once per command.
+        """
+        try:
+            return self._scheduling[command]
+        except KeyError:
+            pass
+        if command in self.config.sources:
+            scheduling = Priority.SOURCE, "source", True
+        else:
+            name, _, arg = command.rpartition("_")
+            priority = self._PRIORITIES.get(name or arg, Priority.NORMAL)
+            if priority is Priority.VOLUME:
+                scheduling = priority, name, arg not in self._RELATIVE
+            else:
+                scheduling = priority, None, False
+        self._scheduling[command] = scheduling
+        return scheduling
+
+    def _queue(
+        self, message: bytes, priority: Priority = Priority.NORMAL, group: Optional[str] = None, supersedes=False
+    ):
+        self._outgoing.push(message, priority, group, supersedes)
+        if self._outgoing_ready:
+            self._outgoing_ready.set()
+
+    def _encode(self, message: str, end: bytes) -> bytes:
+        """Returns the message as sent on the wire. Messages are encoded once and cached, there's only a few of them."""
+        try:
+            return self._encoded[message, end]
+        except KeyError:
+            encoded = self._encoded[message, end] = message.encode() + end
+            return encoded
+
+    async def _write_commands(self):
+        """Sends the queued commands.
+
+        The commands queued since the previous write are sent together, highest priority first, then the writer is
+        drained so a slow amp slows down the writes instead of filling up the buffers. If the transport's link is
+        limited, such as a serial line, the next write also waits until this one is on the wire, and a write keeps the
+        link busy for at most :attr:`MAX_BATCH_TIME`. Commands queued meanwhile are scheduled with the remaining ones.
+        A mute is thus on the wire within about two batch times, however many commands are queued.
+        """
+        while True:
+            await self._outgoing_ready.wait()
+            # Let the tasks that are ready to run queue their commands too, so they go in the same write
+            await asyncio.sleep(0)
+            byte_rate = self.transport.byte_rate
+            batch = self._outgoing.pop_batch(int(byte_rate * self.MAX_BATCH_TIME) if byte_rate else None)
+            if not self._outgoing:
+                self._outgoing_ready.clear()
+            if not batch:
+                continue
+            self._writer.writelines(batch)
+            if self.recorder:
+                self.recorder.record(Direction.SENT, b"".join(batch))
+            await self._writer.drain()
+            if byte_rate:
+                await asyncio.sleep(sum(map(len, batch)) / byte_rate)
+
     async def __aenter__(self):
         await self.connect()
         return self
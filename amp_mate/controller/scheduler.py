@@ -0,0 +1,77 @@
+"""Orders the messages waiting to be sent to a device by priority."""
+from collections import deque
+from enum import IntEnum
+from typing import Deque, Hashable, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    """Classes of messages, the lower the value the sooner they're sent."""
+
+    SAFETY = 0
+    """Mute and power, which must get through however busy the link is."""
+    SOURCE = 1
+    NORMAL = 2
+    """Any other command."""
+    VOLUME = 3
+    """Volume and tone, which may come in floods and are often made stale by a newer one."""
+    REQUEST = 4
+    """Requests come last, so their answer reflects the commands queued before them."""
+
+
+class CommandScheduler:
+    """Queues the messages to send, first by priority, then in order.
+
+    A message can be in a `group`, such as the volume commands. A message that `supersedes` its group drops the queued
+    messages of the same group and priority, which it makes stale, e.g. an absolute volume drops the volume steps queued
+    before it. :meth:`drop` drops every message of a priority.
+    """
+
+    def __init__(self):
+        self.dropped = 0
+        self._levels: List[Deque[Tuple[Optional[Hashable], bytes]]] = [deque() for _ in Priority]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(
+        self, message: bytes, priority: Priority = Priority.NORMAL, group: Optional[Hashable] = None, supersedes=False
+    ):
+        level = self._levels[priority]
+        if supersedes and group is not None and level:
+            kept = deque(entry for entry in level if entry[0] != group)
+            dropped = len(level) - len(kept)
+            if dropped:
+                self._levels[priority] = level = kept
+                self._size -= dropped
+                self.dropped += dropped
+        level.append((group, message))
+        self._size += 1
+
+    def drop(self, priority: Priority) -> int:
+        """Drops every queued message of `priority` and returns how many there were."""
+        level = self._levels[priority]
+        dropped = len(level)
+        level.clear()
+        self._size -= dropped
+        self.dropped += dropped
+        return dropped
+
+    def pop_batch(self, max_bytes: Optional[int] = None) -> List[bytes]:
+        """Removes and returns the messages to send next, in priority order.
+
+        With `max_bytes`, the batch stops before the message that would make it larger, but it has at least one message.
+        """
+        batch = []
+        size = 0
+        for level in self._levels:
+            while level:
+                message = level[0][1]
+                if max_bytes is not None and batch and size + len(message) > max_bytes:
+                    self._size -= len(batch)
+                    return batch
+                level.popleft()
+                batch.append(message)
+                size += len(message)
+        self._size -= len(batch)
+        return batch
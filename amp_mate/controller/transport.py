@@ -0,0 +1,144 @@
+"""Byte stream transports to the devices.
+
+A transport opens an asyncio stream pair. It also knows how many bytes per second the link carries, if it's limited,
+so writes can be paced instead of overrunning the device's buffer.
+"""
+import asyncio
+import os
+from asyncio import StreamReader, StreamWriter
+from typing import Optional, Tuple
+
+try:
+    import termios
+except ImportError:  # Not on Unix
+    termios = None
+
+
+class Transport:
+    byte_rate: Optional[float] = None
+    """Bytes per second the link carries, ``None`` if it's not limited."""
+
+    async def open(self) -> Tuple[StreamReader, StreamWriter]:
+        raise NotImplementedError
+
+
+class TcpTransport(Transport):
+    """Connects over TCP, e.g. to the amp's network port or to a network-to-serial gateway.
+
+    If there's a serial link behind the gateway, set `byte_rate` to its rate.
+    """
+
+    def __init__(self, host: str, port: int, byte_rate: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.byte_rate = byte_rate
+
+    async def open(self) -> Tuple[StreamReader, StreamWriter]:
+        return await asyncio.open_connection(self.host, self.port)
+
+    def __str__(self):
+        return "%s:%s" % (self.host, self.port)
+
+
+class UnixTransport(Transport):
+    """Connects to a Unix socket, e.g. a simulator's. See :class:`~amp_mate.simulators.rotel_simulator.Farm`."""
+
+    def __init__(self, path: str, byte_rate: Optional[float] = None):
+        self.path = path
+        self.byte_rate = byte_rate
+
+    async def open(self) -> Tuple[StreamReader, StreamWriter]:
+        return await asyncio.open_unix_connection(self.path)
+
+    def __str__(self):
+        return self.path
+
+
+class _FdWriter(StreamWriter):
+    """Stream writer that also closes the read side when closed, both sides being on the same device."""
+
+    def __init__(self, *args, read_transport: asyncio.ReadTransport, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._read_transport = read_transport
+
+    def close(self):
+        self._read_transport.close()
+        super().close()
+
+
+async def open_fd_streams(fd: int) -> Tuple[StreamReader, StreamWriter]:
+    """Returns a stream pair reading from and writing to the file descriptor, e.g. a serial device or a pty.
+
+    The descriptor is duplicated for the write side. Closing the writer closes both.
+    """
+    loop = asyncio.get_event_loop()
+    reader = StreamReader()
+    read_transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    write_transport, write_protocol = await loop.connect_write_pipe(
+        lambda: asyncio.StreamReaderProtocol(StreamReader()), os.fdopen(os.dup(fd), "wb", buffering=0)
+    )
+    writer = _FdWriter(write_transport, write_protocol, reader, loop, read_transport=read_transport)
+    return reader, writer
+
+
+class SerialTransport(Transport):
+    """Talks directly to a serial device, such as ``/dev/ttyUSB0``. This needs a Unix system.
+
+    The port is set to raw mode with the given framing: `bytesize` data bits, `parity` (``N``, ``E`` or ``O``) and
+    `stopbits`.
+    """
+
+    PARITIES = ("N", "E", "O")
+
+    def __init__(self, device: str, baudrate: int = 115200, bytesize: int = 8, parity: str = "N", stopbits: int = 1):
+        if termios is None:
+            raise RuntimeError("Serial devices are only supported on Unix.")
+        if not hasattr(termios, "B%s" % baudrate):
+            raise ValueError("Unsupported baud rate %s." % baudrate)
+        if bytesize not in (5, 6, 7, 8):
+            raise ValueError("Got invalid byte size %s. Should be between 5 and 8." % bytesize)
+        if parity not in self.PARITIES:
+            raise ValueError("Got invalid parity %s. Should be one of %s." % (parity, ", ".join(self.PARITIES)))
+        if stopbits not in (1, 2):
+            raise ValueError("Got invalid stop bits %s. Should be 1 or 2." % stopbits)
+        self.device = device
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+
+    @property
+    def byte_rate(self) -> float:
+        # Every byte has a start bit, its data bits, maybe a parity bit and its stop bits.
+        bits = 1 + self.bytesize + (self.parity != "N") + self.stopbits
+        return self.baudrate / bits
+
+    def _configure(self, fd: int):
+        iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(fd)
+        iflag = oflag = lflag = 0
+        cflag &= ~(termios.CSIZE | termios.PARENB | termios.PARODD | termios.CSTOPB)
+        cflag |= termios.CREAD | termios.CLOCAL | getattr(termios, "CS%s" % self.bytesize)
+        if self.parity != "N":
+            cflag |= termios.PARENB
+            if self.parity == "O":
+                cflag |= termios.PARODD
+        if self.stopbits == 2:
+            cflag |= termios.CSTOPB
+        cc[termios.VMIN] = 1
+        cc[termios.VTIME] = 0
+        speed = getattr(termios, "B%s" % self.baudrate)
+        termios.tcsetattr(fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, speed, speed, cc])
+
+    async def open(self) -> Tuple[StreamReader, StreamWriter]:
+        fd = os.open(self.device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            self._configure(fd)
+        except Exception:
+            os.close(fd)
+            raise
+        return await open_fd_streams(fd)
+
+    def __str__(self):
+        return "%s@%s/%s%s%s" % (self.device, self.baudrate, self.bytesize, self.parity, self.stopbits)
@@ -0,0 +1,104 @@
+from typing import Callable, Optional, Tuple
+
+
+Curve = Callable[[float], float]
+"""Maps the normalised volume to the device volume, both as a fraction between 0 and 1.
+
+A curve must be non-decreasing, with ``curve(0) == 0`` and ``curve(1) == 1``.
+"""
+
+
+def linear(x: float) -> float:
+    return x
+
+
+def logarithmic(range_db: float = 60) -> Curve:
+    """Returns a curve where the normalised volume is a position on a `range_db` decibel scale.
+
+    This suits devices whose volume steps are linear in amplitude: the bottom half of the slider covers the quiet end
+    of the range in finer steps.
+    """
+    if range_db <= 0:
+        raise ValueError("Got invalid range %s dB. Should be positive." % range_db)
+    floor = 10 ** (-range_db / 20)
+
+    def curve(x: float) -> float:
+        return (10 ** (range_db * (x - 1) / 20) - floor) / (1 - floor)
+
+    return curve
+
+
+class VolumeMap:
+    """Converts the normalised volume (0 to 100) to and from the device volume with precomputed tables.
+
+    Both tables are built once, so a conversion is an index in a tuple.
+
+    A device volume that doesn't have a normalised value of its own, e.g. when the device has more steps than the
+    normalised scale, is converted to the normalised value of the closest device volume that does. The device's
+    minimum and maximum always convert to the normalised minimum and maximum.
+
+    Converting a device volume to a normalised one and back gives the same device volume, as long as the current device
+    volume is passed to :meth:`to_device`. Otherwise, the echo of a change made on the device could move it again.
+    """
+
+    MIN = 0
+    MAX = 100
+
+    def __init__(self, min_volume: int, max_volume: int, curve: Curve = linear):
+        if min_volume >= max_volume:
+            raise ValueError("Got invalid range %s - %s." % (min_volume, max_volume))
+        self.min_volume = min_volume
+        self.max_volume = max_volume
+        self._forward = self._build_forward(curve)
+        self._reverse = self._build_reverse()
+
+    def _build_forward(self, curve: Curve) -> Tuple[int, ...]:
+        span = self.max_volume - self.min_volume
+        forward = []
+        for value in range(self.MIN, self.MAX + 1):
+            fraction = curve((value - self.MIN) / (self.MAX - self.MIN))
+            if not 0 <= fraction <= 1:
+                raise ValueError("Curve returned %s for %s. Should be between 0 and 1." % (fraction, value))
+            forward.append(self.min_volume + round(fraction * span))
+        if forward[0] != self.min_volume or forward[-1] != self.max_volume:
+            raise ValueError("Curve should map the minimum and maximum volumes to themselves.")
+        if any(low > high for low, high in zip(forward, forward[1:])):
+            raise ValueError("Curve should be non-decreasing.")
+        return tuple(forward)
+
+    def _build_reverse(self) -> Tuple[int, ...]:
+        # Normalised values reaching each device volume
+        reached = {}
+        for value, device_value in enumerate(self._forward, start=self.MIN):
+            reached.setdefault(device_value, []).append(value)
+
+        reverse = []
+        for device_value in range(self.min_volume, self.max_volume + 1):
+            if device_value not in reached:
+                device_value = min(reached, key=lambda reachable: (abs(reachable - device_value), reachable))
+            values = reached[device_value]
+            reverse.append(values[(len(values) - 1) // 2])
+        # The forward table maps the ends to the ends, so this keeps the round trip stable
+        reverse[0], reverse[-1] = self.MIN, self.MAX
+        return tuple(reverse)
+
+    def to_device(self, value: float, current: Optional[int] = None) -> int:
+        """Converts a normalised volume to the device volume.
+
+        If `current`, the current device volume, already converts to `value`, it's returned as is.
+        """
+        value = round(value)
+        if not self.MIN <= value <= self.MAX:
+            raise ValueError('Got invalid volume "%s". Should be between %s and %s.' % (value, self.MIN, self.MAX))
+        if current is not None and self.min_volume <= current <= self.max_volume:
+            if self._reverse[current - self.min_volume] == value:
+                return current
+        return self._forward[value - self.MIN]
+
+    def from_device(self, value: int) -> int:
+        """Converts a device volume to the normalised volume."""
+        if not self.min_volume <= value <= self.max_volume:
+            raise ValueError(
+                'Got invalid volume "%s". Should be between %s and %s.' % (value, self.min_volume, self.max_volume)
+            )
+        return self._reverse[value - self.min_volume]
@@ -1,8 +1,22 @@
+import asyncio
 import logging
 import socketio
-import pprint
-
-from . import Controller, ControllerStatus, VolumeStatus
+import time
+from typing import Callable, Dict, List, Optional
+
+from . import (
+    Controller,
+    ControllerException,
+    ControllerStatus,
+    PlaybackState,
+    PlaybackStatus,
+    StatusCache,
+    Track,
+    VolumeStatus,
+)
+from .health import HealthMonitor
+from .metrics import volume_latency_tracker
+from .recorder import Direction, Recorder
 
 logger = logging.getLogger(__name__)
 
@@ -10,26 +24,93 @@ logger = logging.getLogger(__name__)
 class VolumioController(Controller):
     min_vol = 0
     max_vol = 100
-
-    def __init__(self, host: str, port: int = 3000):
+    QUERY_TIMEOUT = 5
+
+    PLAYBACK_STATES = {"play": PlaybackState.PLAYING, "pause": PlaybackState.PAUSED, "stop": PlaybackState.STOPPED}
+    TRACK_KEYS = ("title", "artist", "album", "uri")
+    _STATE_KEYS = ("volume", "mute", "status") + TRACK_KEYS
+    """Keys of the pushed state that are used. The others, such as the album art or the seek position, are ignored."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 3000,
+        cache_ttl: Optional[Dict[str, float]] = None,
+        recorder: Optional[Recorder] = None,
+        health_deadline: Optional[float] = 10,
+    ):
+        """If a `recorder` is given, the events sent to and received from Volumio are recorded.
+
+        The connection is dropped when nothing is pushed by Volumio for `health_deadline` seconds, see
+        :class:`~.health.HealthMonitor`. Its state is only asked for when it's been quiet for a while. ``None``
+        disables it.
+        """
         self._host = host
         self._port = port
-        self._sio = socketio.AsyncClient()
-        self._sio.on("pushState", self.handle_push_state)
+        self.recorder = recorder
+        self.health_deadline = health_deadline
+        self.health: Optional[HealthMonitor] = None
+        self._health_task = None
+        self._cache = StatusCache(cache_ttl)
+        self._volume_spans = volume_latency_tracker(self)
+        # Reconnection is handled by the Master, so it's the same for every controller
+        self._sio = socketio.AsyncClient(reconnection=False)
+        self._push_listeners: List[Callable[[dict, float], None]] = []
+        self._sio.on("pushState", self._on_push_state)
         self._sio.on("connect", self.handle_connect)
         self._sio.on("disconnect", self.handle_disconnect)
-        self.status = ControllerStatus(volume=VolumeStatus())
+        self.status = ControllerStatus(volume=VolumeStatus(), playback=PlaybackStatus())
+        self._state: Dict[str, object] = {}
 
     async def connect(self):
         logger.debug("Attempting connection to %s:%s" % (self._host, self._port))
         await self._sio.connect("%s:%s" % (self._host, self._port))
+        if self.health_deadline is not None:
+            self.health = HealthMonitor(self._get_state, self.health_deadline)
+            self._health_task = asyncio.ensure_future(self._watch_health())
         await self._get_state()
 
     async def disconnect(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        self._state = {}
+        self._cache.invalidate()
+        self._volume_spans.clear()
+        await self._sio.disconnect()
+
+    async def wait_disconnected(self):
+        # Cancelling the wait mustn't cancel the client's read loop, which disconnect then waits for
+        await asyncio.shield(self._sio.wait())
+
+    async def _watch_health(self):
+        """Disconnects once the connection is found dead, so it's reconnected like a closed one."""
+        await self.health.run()
+        logger.warning("%s stopped answering." % self)
         await self._sio.disconnect()
 
     async def _get_state(self):
-        await self._sio.emit("getState")
+        await self._emit("getState")
+
+    async def _emit(self, event: str, data=None):
+        if self.recorder:
+            self.recorder.record_event(Direction.SENT, event, data)
+        if data is None:
+            await self._sio.emit(event)
+        else:
+            await self._sio.emit(event, data)
+
+    async def _query_state(self):
+        """Asks for the state and waits for it to be pushed."""
+        refreshed = self._cache.refreshed("volume")
+        await self._get_state()
+        try:
+            await asyncio.wait_for(refreshed, timeout=self.QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ControllerException("%s didn't send its state in %ss." % (self, self.QUERY_TIMEOUT))
+
+    def __str__(self):
+        return "Volumio at %s:%s" % (self._host, self._port)
 
     async def __aenter__(self):
         await self.connect()
@@ -38,10 +119,55 @@ class VolumioController(Controller):
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.disconnect()
 
+    def add_push_listener(self, listener: Callable[[dict, float], None]):
+        """Calls `listener` with every state pushed by Volumio once it's handled, and the time handling it took, in
+        seconds. The state is handled by :meth:`handle_push_state` either way.
+        """
+        self._push_listeners.append(listener)
+
+    def _on_push_state(self, state: dict):
+        started = time.perf_counter()
+        self.handle_push_state(state)
+        if self._push_listeners:
+            elapsed = time.perf_counter() - started
+            for listener in self._push_listeners:
+                listener(state, elapsed)
+
     def handle_push_state(self, state: dict):
-        logger.debug("Got state from %s: %s" % (self._host, pprint.pprint(state)))
-        self.status.volume.value = state["volume"]
-        self.status.volume.mute = state["mute"]
+        """Applies the fields of `state` that changed since the previous push.
+
+        Volumio pushes its whole state, many times a second while playing. Only the used keys are compared, see
+        :attr:`_STATE_KEYS`, and only the changed ones are applied.
+        """
+        if self.health:
+            self.health.alive()
+        if self.recorder:
+            self.recorder.record_event(Direction.RECEIVED, "pushState", state)
+        previous = self._state
+        changed = {key: state.get(key) for key in self._STATE_KEYS if state.get(key) != previous.get(key)}
+        self._state = {key: state.get(key) for key in self._STATE_KEYS}
+        if changed:
+            logger.debug("Got state from %s, changed: %s", self, changed)
+            self._apply_state(changed)
+        self._cache.refresh("volume", "mute")
+        self._volume_spans.close(self.status.volume.value)
+
+    def _apply_state(self, changed: dict):
+        if changed.get("volume") is not None:
+            try:
+                self.status.volume.value = changed["volume"]
+            except ValueError:
+                pass  # Logged by the status
+        if changed.get("mute") is not None:
+            self.status.volume.mute = bool(changed["mute"])
+        if "status" in changed:
+            playback = self.PLAYBACK_STATES.get(changed["status"])
+            if playback is None:
+                logger.warning("Got unknown playback status %r from %s.", changed["status"], self)
+                playback = PlaybackState.ERROR
+            self.status.playback.state = playback
+        if any(key in changed for key in self.TRACK_KEYS):
+            self.status.playback.track = Track(*(self._state[key] for key in self.TRACK_KEYS))
 
     def handle_connect(self):
         logger.info("Connected to %s" % self._host)
@@ -50,21 +176,25 @@ class VolumioController(Controller):
         logger.info("Disconnected from %s" % self._host)
 
     async def get_volume(self) -> int:
-        pass
-
-    async def set_volume(self, value: int):
-        if self.min_vol < value < self.max_vol:
-            await self._sio.emit("volume", value)
+        await self._cache.ensure_fresh("volume", self._query_state, key="state")
+        return self.status.volume.value
+
+    async def set_volume(self, value: int, timestamp: Optional[float] = None):
+        if self.min_vol <= value <= self.max_vol:
+            if timestamp is not None:
+                self._volume_spans.open(value, timestamp)
+            await self._emit("volume", value)
         else:
             message = "Got invalid volume %s. Should be between %s and %s." % (value, self.min_vol, self.max_vol)
             logger.warning(message)
             raise ValueError(message)
 
     async def get_mute(self) -> bool:
-        pass
+        await self._cache.ensure_fresh("mute", self._query_state, key="state")
+        return self.status.volume.mute
 
     async def set_mute(self):
-        pass
+        await self._emit("mute")
 
     async def set_unmute(self):
-        pass
+        await self._emit("unmute")
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from asyncio import AbstractEventLoop, AbstractEventLoopPolicy
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+LOOP_POLICIES = ("auto", "uvloop", "asyncio")
+"""Names of the event loop policies. ``auto`` uses uvloop if it's installed and falls back to asyncio."""
+
+
+def get_loop_policy(name: str = "auto") -> AbstractEventLoopPolicy:
+    """Returns the event loop policy called `name`, see :data:`LOOP_POLICIES`.
+
+    Raises:
+        ValueError: If the name is unknown.
+        ImportError: If uvloop is asked for but isn't installed.
+    """
+    if name not in LOOP_POLICIES:
+        raise ValueError("Unknown event loop policy %s. Should be one of %s." % (name, ", ".join(LOOP_POLICIES)))
+
+    if name != "asyncio":
+        try:
+            import uvloop
+        except ImportError:
+            if name == "uvloop":
+                raise
+            logger.debug("uvloop isn't installed, falling back to asyncio.")
+        else:
+            return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
+
+
+def set_loop_policy(policy: Union[str, AbstractEventLoopPolicy] = "auto") -> AbstractEventLoopPolicy:
+    """Sets the event loop policy, given either by name or as an instance, and returns it."""
+    if isinstance(policy, str):
+        policy = get_loop_policy(policy)
+    asyncio.set_event_loop_policy(policy)
+    return policy
+
+
+def describe_loop(loop: AbstractEventLoop) -> str:
+    return "%s.%s" % (type(loop).__module__, type(loop).__name__)
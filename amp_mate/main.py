@@ -1,15 +1,18 @@
 import asyncio
 import os
 
-from controller import VolumioController
+from controller import get_controller
+from event_loop import set_loop_policy
 
 
 if __name__ == "__main__":
     VOLUMIO_HOST = os.getenv("VOLUMIO_HOST")
 
-    volumio = VolumioController(VOLUMIO_HOST, 3000)
+    volumio = get_controller("volumio")(VOLUMIO_HOST, 3000)
 
-    loop = asyncio.get_event_loop()
+    set_loop_policy(os.getenv("AMP_MATE_LOOP", "auto"))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
 
     loop.run_until_complete(volumio.connect())
 
@@ -1,10 +1,16 @@
 import asyncio
 import logging
 import os
+import random
 import threading
-from typing import Iterable
+from asyncio import AbstractEventLoopPolicy
+from typing import Iterable, List, Optional, Tuple, Union
 
-from controller import Controller, VolumioController
+from controller import Controller, PlaybackState, get_controller
+from controller.helpers import Coalescer
+from controller.metrics import REGISTRY, MetricsServer
+from controller.recorder import Recorder
+from event_loop import describe_loop, set_loop_policy
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -14,12 +20,39 @@ class Master:
     """This ties the different controllers together.
 
     The controllers are asynchronous. The Master runs its own event loop and runs the controllers inside it.
+
+    Controllers are connected concurrently, each attempt is abandoned after `connect_timeout` seconds. The Master then
+    supervises every controller and reconnects it when its connection drops or the first attempt failed. The delay
+    between attempts doubles from `reconnect_delay` up to `max_reconnect_delay`, with some random jitter so the devices
+    aren't all hit at once after a power cut.
+
+    `loop_policy` selects the event loop, see :mod:`event_loop`. By default, uvloop is used if it's installed.
+
+    If `metrics_port` is set, the metrics, such as the latency of volume changes, are served on it for Prometheus.
     """
 
-    def __init__(self, controllers: Iterable[Controller]):
-        self._controllers = controllers
-        self.loop = asyncio.get_event_loop()
+    def __init__(
+        self,
+        controllers: Iterable[Controller],
+        connect_timeout: float = 10,
+        reconnect_delay: float = 1,
+        max_reconnect_delay: float = 60,
+        loop_policy: Union[str, AbstractEventLoopPolicy] = "auto",
+        metrics_port: Optional[int] = None,
+    ):
+        self._controllers = list(controllers)
+        set_loop_policy(loop_policy)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        logger.info("Using event loop %s." % describe_loop(self.loop))
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
         self._async_runner = None
+        self._metrics_server = MetricsServer(port=metrics_port) if metrics_port is not None else None
+        self._volume_links: List[Tuple[Controller, Coalescer]] = []
+        self._fade_links: List[Tuple[Controller, Controller, float]] = []
+        self._tasks = []
 
     def __enter__(self):
         self.run()
@@ -28,15 +61,117 @@ class Master:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop()
 
+    def link_volume(self, source: Controller, target: Controller, max_rate: Optional[float] = None) -> Coalescer:
+        """Makes `target` follow the volume of `source`.
+
+        Only the latest volume is sent, at most `max_rate` times per second, so a slow target doesn't build a backlog
+        when the volume changes quickly. The returned :class:`~controller.helpers.Coalescer` counts the merged updates.
+        Without `max_rate`, the target sets the pace: the next volume is only sent once its `set_volume` returns, e.g.
+        once the Rotel amp reports the previous one.
+
+        The time of each change is passed along, so the target can measure the latency until it's applied.
+        """
+        coalescer = Coalescer(lambda change: target.set_volume(change.new, timestamp=change.timestamp), max_rate)
+        self._volume_links.append((source, coalescer))
+        labels = {"source": str(source), "target": str(target)}
+        REGISTRY.gauge(
+            "amp_mate_volume_link_sent", "Volume updates sent to the target.", lambda: coalescer.sent, **labels
+        )
+        REGISTRY.gauge(
+            "amp_mate_volume_link_merged",
+            "Volume updates dropped because a newer one came in.",
+            lambda: coalescer.merged,
+            **labels,
+        )
+        return coalescer
+
+    def link_fades(self, source: Controller, target: Controller, duration: float = 1):
+        """Fades the volume of `target` out when `source` pauses or stops playing, and back in when it plays again.
+
+        The target must support fades, such as :class:`~controller.rotel.RotelController`.
+        """
+        self._fade_links.append((source, target, duration))
+
+    @staticmethod
+    async def _follow_playback(source: Controller, target: Controller, duration: float):
+        with source.status.changes.subscribe(fields=("playback",)) as changes:
+            async for change in changes:
+                if change.new is PlaybackState.PLAYING:
+                    target.fade_in(duration)
+                elif change.new in (PlaybackState.PAUSED, PlaybackState.STOPPED):
+                    target.fade_out(duration)
+
+    @staticmethod
+    async def _follow_volume(source: Controller, coalescer: Coalescer):
+        with source.status.changes.subscribe(fields=("volume",)) as changes:
+            async for change in changes:
+                if change.new is not None:
+                    coalescer.push(change)
+
+    async def _connect_controller(self, controller: Controller) -> bool:
+        """Tries to connect the controller once and returns whether it worked.
+
+        A failed attempt is torn down, so it doesn't leave a connection or tasks behind for the next one.
+        """
+        try:
+            await asyncio.wait_for(controller.connect(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out connecting to %s." % controller)
+        except Exception as e:
+            logger.warning("Failed to connect to %s: %s" % (controller, e))
+        else:
+            logger.info("Connected to %s." % controller)
+            return True
+        await self._disconnect_controller(controller)
+        return False
+
+    async def _disconnect_controller(self, controller: Controller):
+        try:
+            await asyncio.wait_for(controller.disconnect(), timeout=self.connect_timeout)
+        except Exception as e:
+            logger.warning("Failed to disconnect from %s: %r" % (controller, e))
+
+    async def _supervise(self, controller: Controller, connected: bool):
+        """Reconnects the controller whenever it's not connected, backing off exponentially."""
+        delay = self.reconnect_delay
+        while True:
+            if connected:
+                delay = self.reconnect_delay
+                await controller.wait_disconnected()
+                logger.warning("Lost connection to %s." % controller)
+                await self._disconnect_controller(controller)
+
+            pause = random.uniform(delay / 2, delay)
+            logger.info("Reconnecting to %s in %.1fs." % (controller, pause))
+            await asyncio.sleep(pause)
+            delay = min(delay * 2, self.max_reconnect_delay)
+            connected = await self._connect_controller(controller)
+
     async def _connect(self):
         logger.debug("Starting master.")
-        for c in self._controllers:
-            await c.connect()
+        if self._metrics_server:
+            await self._metrics_server.start()
+        connected = await asyncio.gather(*(self._connect_controller(c) for c in self._controllers))
+        for controller, is_connected in zip(self._controllers, connected):
+            self._tasks.append(asyncio.ensure_future(self._supervise(controller, is_connected)))
+        for source, coalescer in self._volume_links:
+            coalescer.start()
+            self._tasks.append(asyncio.ensure_future(self._follow_volume(source, coalescer)))
+        for source, target, duration in self._fade_links:
+            self._tasks.append(asyncio.ensure_future(self._follow_playback(source, target, duration)))
 
     async def _disconnect(self):
         logger.info("Stopping master")
-        for c in self._controllers:
-            await c.disconnect()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for source, coalescer in self._volume_links:
+            await coalescer.stop()
+            logger.info("Volume link from %s: %s sent, %s merged." % (source, coalescer.sent, coalescer.merged))
+        await asyncio.gather(*(self._disconnect_controller(c) for c in self._controllers))
+        if self._metrics_server:
+            await self._metrics_server.stop()
 
     def run(self):
         self.loop.run_until_complete(self._connect())
@@ -50,10 +185,21 @@ class Master:
 
 if __name__ == "__main__":
     VOLUMIO_HOST = os.getenv("VOLUMIO_HOST")
-    volumio = VolumioController(VOLUMIO_HOST, 3000)
+    RECORD = os.getenv("AMP_MATE_RECORD")
+    recorder = Recorder(RECORD) if RECORD else None
+    volumio = get_controller("volumio")(VOLUMIO_HOST, 3000, recorder=recorder)
+
+    METRICS_PORT = os.getenv("AMP_MATE_METRICS_PORT")
 
-    master = Master([volumio])
+    master = Master(
+        [volumio],
+        loop_policy=os.getenv("AMP_MATE_LOOP", "auto"),
+        metrics_port=int(METRICS_PORT) if METRICS_PORT else None,
+    )
     try:
         master.run()
     except KeyboardInterrupt:
         master.stop()
+    finally:
+        if recorder:
+            recorder.close()
@@ -1,5 +1,7 @@
 import asyncio
-from asyncio import StreamWriter, StreamReader
+import logging
+
+from controller.rotel import RotelConfigBase, RotelController
 
 
 def get_input():
@@ -7,35 +9,37 @@ def get_input():
     return msg
 
 
-async def read_from_amp(reader: StreamReader):
-    while True:
-        data = await reader.readuntil(b"$")
-        print(f"Received: {data.decode()!r}")
+async def print_answer(amp: RotelController, param: str):
+    try:
+        print("%s: %r" % (param, await amp.query(param)))
+    except Exception as e:
+        print("%s: %s" % (param, e))
 
 
-async def write_to_amp(writer: StreamWriter):
+async def write_to_amp(amp: RotelController):
+    """Sends what's typed to the amp. Requests end with `?`, several can be in flight at once."""
+    loop = asyncio.get_running_loop()
     while True:
-        loop = asyncio.get_running_loop()
         print("waiting for message...")
         msg = await loop.run_in_executor(None, get_input)
-        # msg = await q.get()
-        writer.write(msg.encode())
-        # q.task_done()
-        print("sent %s to amp" % msg)
+        if msg.endswith("?"):
+            asyncio.ensure_future(print_answer(amp, msg[:-1]))
+        else:
+            amp.send_command(msg.rstrip("!"))
+            print("sent %s to amp" % msg)
 
 
 async def tcp_echo_client():
-    reader, writer = await asyncio.open_connection("rotel", 9590)
-
-    writer.write("rs232_update_on!".encode())
-    writer.write("vol_up!".encode())
+    config = RotelConfigBase(min_volume=0, max_volume=96, sources=["cd", "aux", "tuner", "phono", "usb"])
 
-    await asyncio.gather(read_from_amp(reader), write_to_amp(writer))
+    async with RotelController("rotel", 9590, config) as amp:
+        amp.send_command("rs232_update_on")
+        amp.send_command("vol_up")
+        await write_to_amp(amp)
 
     print("Close the connection")
-    writer.close()
-    await writer.wait_closed()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     asyncio.run(tcp_echo_client())
@@ -1,12 +1,94 @@
+import argparse
 import asyncio
 from asyncio import StreamReader, StreamWriter
 import logging
+import os
+import random
 import re
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
+class LinkEmulation:
+    """Emulates a serial link behind an IP gateway, which is slower and less reliable than a loopback connection.
+
+    Every byte takes ``10 / baudrate`` seconds on the wire, as with 8N1 framing, in each direction. A reply is ready
+    after `latency` seconds, plus up to `jitter` seconds at random, and replies still go out in order. Each reply frame
+    is dropped with probability `drop_rate` and sent twice with probability `duplicate_rate`. `seed` makes the random
+    choices repeatable.
+    """
+
+    def __init__(
+        self,
+        baudrate: Optional[int] = None,
+        latency: float = 0,
+        jitter: float = 0,
+        drop_rate: float = 0,
+        duplicate_rate: float = 0,
+        seed: Optional[int] = None,
+    ):
+        if baudrate is not None and baudrate <= 0:
+            raise ValueError("Got invalid baud rate %s. Should be positive." % baudrate)
+        if latency < 0 or jitter < 0:
+            raise ValueError("Latency and jitter can't be negative.")
+        for rate in (drop_rate, duplicate_rate):
+            if not 0 <= rate <= 1:
+                raise ValueError("Got invalid rate %s. Should be between 0 and 1." % rate)
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.duplicate_rate = duplicate_rate
+        self._random = random.Random(seed)
+
+    @property
+    def byte_time(self) -> float:
+        return 10 / self.baudrate if self.baudrate else 0
+
+    @property
+    def is_ideal(self) -> bool:
+        return not (self.baudrate or self.latency or self.jitter or self.drop_rate or self.duplicate_rate)
+
+    def delay(self) -> float:
+        """Returns the time until a reply is ready."""
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def frames(self, replies: Iterable[str]) -> List[str]:
+        """Returns the replies as they go on the wire, some dropped and some duplicated."""
+        frames = []
+        for reply in replies:
+            if self.drop_rate and self._random.random() < self.drop_rate:
+                logger.debug("Dropping '%s'.", reply)
+                continue
+            frames.append(reply)
+            if self.duplicate_rate and self._random.random() < self.duplicate_rate:
+                logger.debug("Duplicating '%s'.", reply)
+                frames.append(reply)
+        return frames
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser):
+        group = parser.add_argument_group("link emulation")
+        group.add_argument("--baudrate", type=int, help="emulate a serial link at this rate, e.g. 9600 or 115200")
+        group.add_argument("--latency", type=float, default=0, help="processing latency, in milliseconds")
+        group.add_argument("--jitter", type=float, default=0, help="maximum random extra latency, in milliseconds")
+        group.add_argument("--drop-rate", type=float, default=0, help="probability of dropping a reply")
+        group.add_argument("--duplicate-rate", type=float, default=0, help="probability of sending a reply twice")
+        group.add_argument("--seed", type=int, help="seed of the random choices")
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "LinkEmulation":
+        return cls(
+            baudrate=args.baudrate,
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            drop_rate=args.drop_rate,
+            duplicate_rate=args.duplicate_rate,
+            seed=args.seed,
+        )
+
+
 class RA1572:
     """Simulates a Rotel RA-1572 v2.65 and newer amplifier. Not all functions are implemented.
 
@@ -14,8 +96,13 @@ class RA1572:
     `Source <http://www.rotel.com/sites/default/files/product/rs232/RA1572%20Protocol.pdf>`_.
 
     Implemented functions are in the :attr:`~_COMMANDS` and :attr:`~_REQUESTS` attributes.
+
+    The simulator listens on `host` and `port`, or on the Unix socket at `path` if it's given. Connections are
+    instantaneous and reliable, unless a :class:`LinkEmulation` is given as `link`.
     """
 
+    VERSION = "2.65"
+    MODEL = "ra1572"
     VOL_MIN = 0
     VOL_MAX = 96
     TONE_MIN = 0
@@ -43,20 +130,33 @@ class RA1572:
         "model": "model",
     }
 
-    # Commands with an argument, like `vol_up`
-    MSG_PATTERNS = {re.compile(r"^%s(?:_(?P<arg>[a-z0-9\-+]+))?!$" % cmd): attr for cmd, attr in _COMMANDS.items()}
-    """ This is a map of the form :code:`pattern: attribute`. Whichever pattern matches indicates witch attribute to
-    get/set. 
-    
-    Command patterns will match with an `arg` group. This may be ``None``, e.g. in the case of ``mute!``.
-    Requests match without the `arg` group.
+    _MESSAGES = {"%s?" % req: (attr, False, None) for req, attr in _REQUESTS.items()}
+    """ This is a map of the form :code:`message: (attribute, is_command, argument)` for every message that doesn't take
+    a free argument: requests, sources and commands without an argument, e.g. ``mute!``. It's built once per class so
+    the message is found in a single lookup.
+
+    Commands with an argument, like ``vol_up!``, are split on their last ``_`` and the command is looked up in
+    :attr:`~_COMMANDS`. The argument must match :attr:`~_ARG_PATTERN`.
     """
     # Commands without an argument, like `cd`
-    MSG_PATTERNS.update({re.compile(r"^(?P<arg>%s)!$" % src): "source" for src in _SOURCES})
-    # Requests
-    MSG_PATTERNS.update({re.compile(r"%s\?$" % req): attr for req, attr in _REQUESTS.items()})
+    _MESSAGES.update({"%s!" % src: ("source", True, src) for src in _SOURCES})
+    # Commands whose argument is omitted, like `mute!`
+    _MESSAGES.update({"%s!" % cmd: (attr, True, None) for cmd, attr in _COMMANDS.items()})
+
+    _ARG_PATTERN = re.compile(r"[a-z0-9\-+]+")
+
+    _MESSAGE_PATTERN = re.compile(r"[^!?]*[!?]")
+    """ A complete message ends with either ``!`` or ``?``. """
 
-    def __init__(self, host: Optional[str] = "0.0.0.0", port: Optional[int] = 9590):
+    READ_SIZE = 1024
+
+    def __init__(
+        self,
+        host: Optional[str] = "0.0.0.0",
+        port: Optional[int] = 9590,
+        link: Optional[LinkEmulation] = None,
+        path: Optional[str] = None,
+    ):
         self._power = True
         self._source = "cd"
         self._volume = 0
@@ -71,7 +171,9 @@ class RA1572:
         self._auto_update = False
         self._host = host
         self._port = port
+        self.path = path
         self._srv = None
+        self.link = link if link and not link.is_ideal else None
 
     @property
     def power(self):
@@ -132,9 +234,55 @@ class RA1572:
         else:
             raise ValueError("Unknown source %s" % value)
 
+    @property
+    def bypass(self):
+        return "bypass=%s" % ("on" if self._bypass else "off")
+
+    @staticmethod
+    def _format_tone(value: int) -> str:
+        return "%+03i" % value if value else "000"
+
+    @property
+    def bass(self):
+        return "bass=%s" % self._format_tone(self._bass)
+
+    @property
+    def treble(self):
+        return "treble=%s" % self._format_tone(self._treble)
+
+    @property
+    def balance(self):
+        if self._balance < 0:
+            return "balance=L%02i" % -self._balance
+        if self._balance > 0:
+            return "balance=R%02i" % self._balance
+        return "balance=000"
+
+    @property
+    def freq(self):
+        """There's no actual input signal, so there's no frequency."""
+        return "freq=off"
+
+    @property
+    def speaker(self):
+        speakers = [name for name, on in (("a", self._speaker_a), ("b", self._speaker_b)) if on]
+        return "speaker=%s" % ("_".join(speakers) or "off")
+
+    @property
+    def dimmer(self):
+        return "dimmer=%i" % self._dimmer
+
+    @property
+    def version(self):
+        return "version=%s" % self.VERSION
+
+    @property
+    def model(self):
+        return "model=%s" % self.MODEL
+
     @property
     def auto_update(self) -> str:
-        """ Whether the amp sends an update when the state changes.
+        """Whether the amp sends an update when the state changes.
 
         Values are `auto` or `manual`.
         """
@@ -165,7 +313,7 @@ class RA1572:
         If the command is a setter, the function only returns if :attr:`~auto_update` is `True` and if the function
         returns something.
 
-        The command is matched with a pattern. See the description of :attr:`~MSG_PATTERNS` above for how this works.
+        The command is looked up in a table. See the description of :attr:`~_MESSAGES` above for how this works.
 
         Attributes:
             msg (str): The message as received from the client.
@@ -176,26 +324,30 @@ class RA1572:
         Raises:
             ValueError: If the message is not understood for various reasons (unknown command, wrong termination, etc).
         """
-        for pattern, attr in self.MSG_PATTERNS.items():
-            match = pattern.fullmatch(msg)
-
-            if not match:
-                continue
-
-            if match.groups():
-                arg, = match.groups()
-                setattr(self, attr, arg)
-                result = getattr(self, attr) if self._auto_update else None
-            else:
-                result = getattr(self, attr)
-            break
+        entry = self._MESSAGES.get(msg)
+        if entry is None:
+            entry = self._split_command(msg)
+        attr, is_command, arg = entry
+
+        if is_command:
+            setattr(self, attr, arg)
+            result = getattr(self, attr) if self._auto_update else None
         else:
-            raise ValueError("Message not understood: `%s`" % msg)
+            result = getattr(self, attr)
 
         if result:
             result += "$"
             return result
 
+    def _split_command(self, msg: str) -> Tuple[str, bool, str]:
+        """Splits a command with an argument, like ``vol_up!``, into its table entry."""
+        if msg.endswith("!"):
+            cmd, _, arg = msg[:-1].rpartition("_")
+            attr = self._COMMANDS.get(cmd)
+            if attr is not None and self._ARG_PATTERN.fullmatch(arg):
+                return attr, True, arg
+        raise ValueError("Message not understood: `%s`" % msg)
+
     def status(self):
         power = "Power: %s" % self.power
         volume = "Volume: %s" % self.volume
@@ -203,26 +355,117 @@ class RA1572:
 
         return "Status: %15s - %12s - %10s" % (power, volume, mute)
 
+    @classmethod
+    def split_messages(cls, data: str) -> Tuple[List[str], str]:
+        """Splits the received data into complete messages.
+
+        Returns:
+            Tuple[List[str], str]: The complete messages, with their terminator, and what's left of an incomplete one.
+        """
+        messages = []
+        end = 0
+        for match in cls._MESSAGE_PATTERN.finditer(data):
+            messages.append(match.group())
+            end = match.end()
+        return messages, data[end:]
+
+    def handle_messages(self, messages: Iterable[str]) -> str:
+        """Handles each message in turn and returns all the replies joined together.
+
+        Messages that aren't understood are logged and skipped, so they don't affect the following ones.
+        """
+        return "".join(self._replies(messages))
+
+    def _replies(self, messages: Iterable[str]) -> List[str]:
+        replies = []
+        for message in messages:
+            logger.debug("Got message '%s'.", message)
+            try:
+                result = self.handle_message(message)
+            except ValueError as e:
+                logger.warning(e)
+                continue
+            if result:
+                replies.append(result)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(self.status())
+        return replies
+
     async def handle_connection(self, reader: StreamReader, writer: StreamWriter):
+        """Handles a client connection.
+
+        The client may send several messages in one go, or a message split over several reads. All the replies to the
+        messages completed by a read are sent in one write.
+        """
         peer = writer.get_extra_info("peername")
         logger.info("Got a new connection from {}.".format(peer))
 
+        if self.link:
+            frames = asyncio.Queue()
+            send_task = asyncio.ensure_future(self._send_frames(writer, frames))
+
+        pending = ""
+        ready_at = 0
         while True:
-            message = (await reader.read(100)).decode()
-            logger.debug("Got message '%s'." % message)
-            result = self.handle_message(message)
-            logger.debug(self.status())
-            if result:
-                writer.write(result.encode())
+            data = await reader.read(self.READ_SIZE)
+            if not data:
+                break
+            if self.link and self.link.byte_time:
+                # The data is only received once it's through the serial link
+                await asyncio.sleep(len(data) * self.link.byte_time)
+            messages, pending = self.split_messages(pending + data.decode())
+            replies = self._replies(messages)
+            if self.link:
+                # Replies stay in order, however the jitter falls
+                ready_at = max(ready_at, asyncio.get_event_loop().time() + self.link.delay())
+                for frame in self.link.frames(replies):
+                    frames.put_nowait((ready_at, frame.encode()))
+            elif replies:
+                writer.write("".join(replies).encode())
+
+        logger.info("Connection from {} closed.".format(peer))
+        if self.link:
+            send_task.cancel()
+        writer.close()
+
+    async def _send_frames(self, writer: StreamWriter, frames: asyncio.Queue):
+        """Sends the frames once they're ready and through the serial link, one at a time."""
+        loop = asyncio.get_event_loop()
+        line_free = 0
+        while True:
+            ready_at, frame = await frames.get()
+            sent_at = max(ready_at, line_free) + len(frame) * self.link.byte_time
+            line_free = sent_at
+            delay = sent_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            writer.write(frame)
+
+    @property
+    def port(self) -> Optional[int]:
+        """The port the simulator listens on. Useful when it was started on port 0."""
+        if self.path:
+            return None
+        if self._srv and self._srv.sockets:
+            return self._srv.sockets[0].getsockname()[1]
+        return self._port
 
     async def start(self):
-        self._srv = await asyncio.start_server(self.handle_connection, host=self._host, port=self._port)
-        logger.info("Listening on %s:%s" % (self._host, self._port))
-        logger.info(self.status())
+        """Starts listening and returns."""
+        if self.path:
+            self._srv = await asyncio.start_unix_server(self.handle_connection, path=self.path)
+            logger.info("Listening on %s" % self.path)
+        else:
+            self._srv = await asyncio.start_server(self.handle_connection, host=self._host, port=self._port)
+            logger.info("Listening on %s:%s" % (self._host, self.port))
+        logger.debug(self.status())
+
+    async def serve_forever(self):
+        await self.start()
         await self._srv.serve_forever()
 
     async def stop(self):
-        await self._srv.close()
+        self._srv.close()
         await self._srv.wait_closed()
         self._srv = None
 
@@ -234,7 +477,85 @@ class RA1572:
         await self.stop()
 
 
+class Farm:
+    """Runs `count` independent simulators in one process, each with its own state.
+
+    They listen on consecutive ports from `port` on `host`, or on Unix sockets named ``amp-000.sock`` and so on in
+    `socket_dir`, which is created if needed. With `port` 0, every simulator gets a free port. They share the `link`
+    emulation, if any.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        host: str = "127.0.0.1",
+        port: int = 9590,
+        socket_dir: Optional[str] = None,
+        link: Optional[LinkEmulation] = None,
+    ):
+        if count < 1:
+            raise ValueError("Got invalid count %s. Should be at least 1." % count)
+        self.socket_dir = socket_dir
+        if socket_dir:
+            self.amps = [
+                RA1572(link=link, path=os.path.join(socket_dir, "amp-%03i.sock" % index)) for index in range(count)
+            ]
+        else:
+            self.amps = [RA1572(host, port + index if port else 0, link=link) for index in range(count)]
+        self._host = host
+
+    @property
+    def addresses(self) -> List[str]:
+        """Where each simulator listens, as ``host:port`` or the socket's path."""
+        return [amp.path or "%s:%s" % (self._host, amp.port) for amp in self.amps]
+
+    async def start(self):
+        if self.socket_dir:
+            os.makedirs(self.socket_dir, exist_ok=True)
+        try:
+            for amp in self.amps:
+                await amp.start()
+        except Exception:
+            await self.stop()
+            raise
+        logger.info("Started %s simulators." % len(self.amps))
+
+    async def stop(self):
+        for amp in self.amps:
+            if amp._srv:
+                await amp.stop()
+            if amp.path and os.path.exists(amp.path):
+                os.unlink(amp.path)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.gather(*(amp._srv.serve_forever() for amp in self.amps))
+        finally:
+            await self.stop()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG)
-    ra = RA1572()
-    asyncio.run(ra.start())
+    parser = argparse.ArgumentParser(description="Simulates Rotel RA-1572 amplifiers over TCP or Unix sockets.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9590, help="port of the first amp, the others follow")
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of amps")
+    parser.add_argument("--socket-dir", help="listen on Unix sockets in this directory instead of TCP ports")
+    LinkEmulation.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.count == 1 else logging.INFO)
+    link = LinkEmulation.from_args(args)
+    if args.count == 1 and not args.socket_dir:
+        ra = RA1572(args.host, args.port, link=link)
+        asyncio.run(ra.serve_forever())
+    else:
+        farm = Farm(args.count, args.host, args.port, args.socket_dir, link=link)
+        asyncio.run(farm.serve_forever())
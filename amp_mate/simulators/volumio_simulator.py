@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import base64
+import logging
+import random
+import socket
+from typing import Optional, Union
+
+import socketio
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class Volumio:
+    """Simulates the websocket API of a Volumio player. Only the volume and playback related events are implemented.
+
+    Clients get the state with ``getState``, and change it with ``volume``, ``mute``, ``unmute``, ``play``, ``pause``
+    and ``stop``. The state is pushed to every client with ``pushState`` when it changes, and `push_rate` times per
+    second while playing, as the seek position moves.
+
+    The pushed state can be made larger, like a real one: `queue_size` tracks of the queue are included, and the album
+    art is a data URI of `art_size` bytes.
+    """
+
+    TRACKS = [
+        ("So What", "Miles Davis", "Kind of Blue"),
+        ("Blue in Green", "Miles Davis", "Kind of Blue"),
+        ("Take Five", "The Dave Brubeck Quartet", "Time Out"),
+        ("Naima", "John Coltrane", "Giant Steps"),
+    ]
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 3000,
+        push_rate: float = 0,
+        queue_size: int = 0,
+        art_size: int = 0,
+        seed: Optional[int] = None,
+    ):
+        if push_rate < 0 or queue_size < 0 or art_size < 0:
+            raise ValueError("Push rate, queue size and art size can't be negative.")
+        self.push_rate = push_rate
+        self.pushes = 0
+        self._host = host
+        self._port = port
+        self._volume = 50
+        self._mute = False
+        self._status = "play"
+        self._seek = 0
+        self._random = random.Random(seed)
+        self._track = self._random.randrange(len(self.TRACKS))
+        self._albumart = self._make_albumart(art_size)
+        self._queue = [self._queue_item(index) for index in range(queue_size)]
+
+        self._sio = socketio.AsyncServer(async_mode="aiohttp")
+        self._app = web.Application()
+        self._sio.attach(self._app)
+        self._sio.on("getState", self.handle_get_state)
+        self._sio.on("volume", self.handle_volume)
+        self._sio.on("mute", self.handle_mute)
+        self._sio.on("unmute", self.handle_unmute)
+        self._sio.on("play", self.handle_play)
+        self._sio.on("pause", self.handle_pause)
+        self._sio.on("stop", self.handle_stop)
+        self._runner = self._socket = None
+        self._push_task = None
+
+    def _make_albumart(self, size: int) -> str:
+        if not size:
+            return "/albumart"
+        # Base64 makes it a third larger, the URI is about `size` long
+        data = base64.b64encode(bytes(self._random.getrandbits(8) for _ in range(size * 3 // 4))).decode()
+        return "data:image/jpeg;base64," + data
+
+    def _queue_item(self, index: int) -> dict:
+        title, artist, album = self.TRACKS[index % len(self.TRACKS)]
+        return {
+            "uri": "mnt/NAS/%s/%s.flac" % (album, title),
+            "service": "mpd",
+            "name": title,
+            "artist": artist,
+            "album": album,
+            "type": "song",
+            "tracknumber": index + 1,
+            "albumart": "/albumart?cacheid=%i&web=%s/%s/extralarge" % (index, artist, album),
+            "duration": 300,
+            "samplerate": "44.1 kHz",
+            "bitdepth": "16 bit",
+            "trackType": "flac",
+            "channels": 2,
+        }
+
+    def state(self) -> dict:
+        """Returns the state as pushed by Volumio."""
+        title, artist, album = self.TRACKS[self._track]
+        state = {
+            "status": self._status,
+            "position": self._track,
+            "title": title,
+            "artist": artist,
+            "album": album,
+            "albumart": self._albumart,
+            "uri": "mnt/NAS/%s/%s.flac" % (album, title),
+            "trackType": "flac",
+            "seek": self._seek,
+            "duration": 300,
+            "samplerate": "44.1 kHz",
+            "bitdepth": "16 bit",
+            "channels": 2,
+            "random": False,
+            "repeat": False,
+            "repeatSingle": False,
+            "consume": False,
+            "volume": self._volume,
+            "disableVolumeControl": False,
+            "mute": self._mute,
+            "stream": "flac",
+            "updatedb": False,
+            "volatile": False,
+            "service": "mpd",
+        }
+        if self._queue:
+            state["queue"] = self._queue
+        return state
+
+    async def push_state(self, to: Optional[str] = None):
+        """Pushes the state to the client `to`, or to every client."""
+        await self.push(self.state(), to)
+
+    async def push(self, state: dict, to: Optional[str] = None):
+        """Pushes `state` as is, e.g. a recorded one, to the client `to`, or to every client."""
+        self.pushes += 1
+        await self._sio.emit("pushState", state, room=to)
+
+    async def handle_get_state(self, sid: str, *args):
+        await self.push_state(to=sid)
+
+    async def handle_volume(self, sid: str, value: Union[int, str]):
+        """Sets the volume. It can be a value between 0 and 100, or ``+`` or ``-`` to change it by one step."""
+        if value == "+":
+            volume = self._volume + 1
+        elif value == "-":
+            volume = self._volume - 1
+        else:
+            try:
+                volume = int(value)
+            except (TypeError, ValueError):
+                logger.warning("Got invalid volume %r." % (value,))
+                return
+        self._volume = min(max(volume, 0), 100)
+        await self.push_state()
+
+    async def handle_mute(self, sid: str, *args):
+        self._mute = True
+        await self.push_state()
+
+    async def handle_unmute(self, sid: str, *args):
+        self._mute = False
+        await self.push_state()
+
+    async def handle_play(self, sid: str, *args):
+        await self._set_status("play")
+
+    async def handle_pause(self, sid: str, *args):
+        await self._set_status("pause")
+
+    async def handle_stop(self, sid: str, *args):
+        self._seek = 0
+        await self._set_status("stop")
+
+    async def _set_status(self, status: str):
+        if status != self._status:
+            self._status = status
+            await self.push_state()
+
+    async def _push_periodically(self):
+        interval = 1 / self.push_rate
+        while True:
+            await asyncio.sleep(interval)
+            if self._status == "play":
+                self._seek += round(1000 * interval)
+                await self.push_state()
+
+    @property
+    def port(self) -> int:
+        """The port the simulator listens on. Useful when it was started on port 0."""
+        if self._socket:
+            return self._socket.getsockname()[1]
+        return self._port
+
+    @property
+    def url(self) -> str:
+        host = "127.0.0.1" if self._host in ("0.0.0.0", "") else self._host
+        return "http://%s:%s" % (host, self.port)
+
+    async def start(self):
+        """Starts listening and returns."""
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self._host, self._port))
+        self._runner = web.AppRunner(self._app, handle_signals=False)
+        await self._runner.setup()
+        await web.SockSite(self._runner, self._socket).start()
+        if self.push_rate:
+            self._push_task = asyncio.ensure_future(self._push_periodically())
+        logger.info("Listening on %s" % self.url)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self._push_task:
+            self._push_task.cancel()
+            self._push_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--push-rate", type=float, default=0, help="states pushed per second while playing")
+    parser.add_argument("--queue-size", type=int, default=0, help="tracks of the queue included in the state")
+    parser.add_argument("--art-size", type=int, default=0, help="size of the album art sent in the state, in bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates a Volumio player's websocket API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    add_arguments(parser)
+    parser.add_argument("--seed", type=int, help="seed of the random choices")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    volumio = Volumio(args.host, args.port, args.push_rate, args.queue_size, args.art_size, args.seed)
+    asyncio.run(volumio.serve_forever())
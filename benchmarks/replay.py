@@ -0,0 +1,232 @@
+"""Replays a recorded session, see :mod:`amp_mate.controller.recorder`, into a device.
+
+What the controller sent is sent again with the recorded timing, sped up by a factor, or as fast as possible. Rotel
+sessions go to an :class:`~amp_mate.simulators.rotel_simulator.RA1572` simulator started on a local port, unless the
+address of another amp is given. Volumio sessions go to a
+:class:`~amp_mate.simulators.volumio_simulator.Volumio` simulator, unless the URL of another server is given.
+
+What Volumio pushed can be replayed the other way, from a simulator into a
+:class:`~amp_mate.controller.volumio.VolumioController`, e.g. to reproduce a storm of states while a slider is dragged.
+
+A log may hold several recording sessions. Each one is replayed on its own timeline, right after the previous one.
+
+Run ``python -m benchmarks.replay --help`` from the repository root for the options. Results are written as JSON so runs
+can be compared.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional, Sequence
+
+from amp_mate.controller.recorder import Direction, Record, decode_event, read_records
+from amp_mate.event_loop import LOOP_POLICIES, describe_loop, set_loop_policy
+from amp_mate.simulators.rotel_simulator import RA1572
+from benchmarks.rotel import _ms, percentile
+
+
+async def replay(
+    records: Iterable[Record],
+    send: Callable[[bytes], Awaitable],
+    speed: Optional[float] = 1,
+    direction: Direction = Direction.SENT,
+) -> dict:
+    """Sends the payloads of the records in `direction` with `send`, keeping the recorded time between them divided by
+    `speed`. The timing restarts at each session.
+
+    If `speed` is ``None`` or 0, the payloads are sent as fast as possible. Returns the number of payloads and bytes
+    sent, and how late the replay was on the recorded timing at worst.
+    """
+    count = size = 0
+    behind = 0.0
+    first = started = None
+    for record in records:
+        if record.direction is Direction.SESSION:
+            first = None
+            continue
+        if record.direction is not direction:
+            continue
+        now = time.monotonic()
+        if first is None:
+            first, started = record.timestamp, now
+        if speed:
+            due = started + (record.timestamp - first) / speed
+            if due > now:
+                await asyncio.sleep(due - now)
+            else:
+                behind = max(behind, now - due)
+        await send(record.payload)
+        count += 1
+        size += len(record.payload)
+    return {"sent": count, "bytes_sent": size, "max_behind_ms": 1000 * behind}
+
+
+async def replay_to_rotel(
+    records: Iterable[Record], host: Optional[str] = None, port: Optional[int] = None, speed: Optional[float] = 1
+) -> dict:
+    """Replays a Rotel session. If `host` is ``None``, a simulator is started on a local port."""
+    amp = None
+    if host is None:
+        amp = RA1572(host="127.0.0.1", port=0)
+        await amp.start()
+        host, port = "127.0.0.1", amp.port
+
+    received: List[int] = []
+
+    async def read(reader: asyncio.StreamReader):
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                return
+            received.append(len(data))
+
+    async def send(payload: bytes):
+        writer.write(payload)
+        await writer.drain()
+
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        read_task = asyncio.ensure_future(read(reader))
+        started = time.perf_counter()
+        results = await replay(records, send, speed)
+        duration = time.perf_counter() - started
+        # The amp closes the connection once it has answered everything
+        writer.write_eof()
+        await asyncio.wait([read_task], timeout=1)
+        read_task.cancel()
+        writer.close()
+    finally:
+        if amp:
+            await amp.stop()
+
+    results.update(duration=duration, bytes_received=sum(received))
+    return results
+
+
+async def replay_to_volumio(records: Iterable[Record], url: Optional[str] = None, speed: Optional[float] = 1) -> dict:
+    """Replays a Volumio session to the socket.io server at `url`. If it's ``None``, a simulator is started."""
+    import socketio
+    from amp_mate.simulators.volumio_simulator import Volumio
+
+    volumio = None
+    if url is None:
+        volumio = Volumio(host="127.0.0.1", port=0)
+        await volumio.start()
+        url = volumio.url
+
+    sio = socketio.AsyncClient(reconnection=False)
+    pushed = []
+    sio.on("pushState", lambda state: pushed.append(state))
+
+    async def send(payload: bytes):
+        event, data = decode_event(payload)
+        if data is None:
+            await sio.emit(event)
+        else:
+            await sio.emit(event, data)
+
+    await sio.connect(url)
+    try:
+        started = time.perf_counter()
+        results = await replay(records, send, speed)
+        duration = time.perf_counter() - started
+    finally:
+        await sio.disconnect()
+        if volumio:
+            await volumio.stop()
+
+    results.update(duration=duration, states_received=len(pushed))
+    return results
+
+
+async def replay_pushes(records: Iterable[Record], speed: Optional[float] = 1) -> dict:
+    """Pushes the states Volumio pushed in a session from a simulator to a controller.
+
+    Returns the time the controller spent handling each state, as well as the number of states it handled. The states
+    it asks for when connecting are included.
+    """
+    from amp_mate.controller.volumio import VolumioController
+    from amp_mate.simulators.volumio_simulator import Volumio
+
+    volumio = Volumio(host="127.0.0.1", port=0)
+    await volumio.start()
+    controller = VolumioController("http://127.0.0.1", volumio.port, health_deadline=None)
+    timings: List[float] = []
+    controller.add_push_listener(lambda state, elapsed: timings.append(elapsed))
+
+    async def send(payload: bytes):
+        event, data = decode_event(payload)
+        if event == "pushState":
+            await volumio.push(data)
+
+    try:
+        async with controller:
+            started = time.perf_counter()
+            results = await replay(records, send, speed, direction=Direction.RECEIVED)
+            # Every state pushed by the simulator, including the ones asked for, is handled before stopping
+            while len(timings) < volumio.pushes:
+                await asyncio.sleep(0.01)
+            duration = time.perf_counter() - started
+    finally:
+        await volumio.stop()
+
+    timings.sort()
+    results.update(
+        duration=duration,
+        states_handled=len(timings),
+        handle_ms={
+            "p50": _ms(percentile(timings, 50)),
+            "p99": _ms(percentile(timings, 99)),
+            "max": _ms(timings[-1] if timings else None),
+        },
+    )
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Replays a recorded session into a device.")
+    parser.add_argument("log", help="traffic log to replay")
+    parser.add_argument("--device", choices=("rotel", "volumio"), default="rotel", help="recorded device")
+    parser.add_argument("--host", help="amp to replay to instead of a local simulator")
+    parser.add_argument("--port", type=int, default=9590)
+    parser.add_argument("--url", help="Volumio to replay to instead of a local simulator, e.g. http://volumio:3000")
+    parser.add_argument(
+        "--pushes", action="store_true", help="replay the states Volumio pushed into a controller, for --device volumio"
+    )
+    parser.add_argument("-s", "--speed", type=float, default=1, help="speed factor, 0 for as fast as possible")
+    parser.add_argument("--loop", choices=LOOP_POLICIES, default="asyncio", help="event loop to run on")
+    parser.add_argument("-o", "--output", help="JSON file for the results, default is stdout")
+    args = parser.parse_args(argv)
+    set_loop_policy(args.loop)
+
+    records = list(read_records(args.log))
+
+    async def run():
+        if args.device == "rotel":
+            results = await replay_to_rotel(records, args.host, args.port, args.speed)
+        elif args.pushes:
+            results = await replay_pushes(records, args.speed)
+        else:
+            results = await replay_to_volumio(records, args.url, args.speed)
+        results.update(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            loop=describe_loop(asyncio.get_event_loop()),
+            log=args.log,
+            speed=args.speed,
+        )
+        return results
+
+    results = asyncio.run(run())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Measures the throughput and round-trip latency of :class:`~amp_mate.controller.rotel.RotelController`.
+
+The controller is driven against an :class:`~amp_mate.simulators.rotel_simulator.RA1572` simulator started on a local
+port, unless the address of another amp is given. Each message is sent by one of the concurrent workers, picked from
+the command mix, and its round trip lasts until the amp's answer or update for it is received. Requests go through
+:meth:`~amp_mate.controller.rotel.RotelController.query`, so workers asking for a parameter already being asked for
+share the same request.
+
+Run ``python -m benchmarks.rotel --help`` from the repository root for the options. Results are written as JSON so runs
+can be compared.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+from amp_mate.controller.base_controller import ControllerException
+from amp_mate.controller.rotel import RotelConfigBase, RotelController
+from amp_mate.event_loop import LOOP_POLICIES, describe_loop, set_loop_policy
+from amp_mate.simulators.rotel_simulator import RA1572
+
+DEFAULT_MIX = {"volume?": 4, "mute?": 1, "vol_up": 2, "vol_dwn": 2}
+
+# Parameter reported by the amp's update after a command, by command prefix
+_COMMAND_PARAMS = {"vol": "volume", "mute": "mute", "power": "power"}
+
+
+def percentile(values: Sequence[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parses a command mix of the form ``volume?=4,vol_up=1``. Requests end with ``?``."""
+    mix = {}
+    for item in text.split(","):
+        message, _, weight = item.partition("=")
+        mix[message.strip()] = float(weight) if weight else 1
+    return mix
+
+
+def _param_for(message: str) -> str:
+    if message.endswith("?"):
+        return message[:-1]
+    if message in RA1572._SOURCES:
+        return "source"
+    return _COMMAND_PARAMS[message.split("_", 1)[0]]
+
+
+async def _round_trip(controller: RotelController, message: str, param: str):
+    if message.endswith("?"):
+        await controller.query(param)
+        return
+    reported = controller.reported(param)
+    controller.send_command(message)
+    await asyncio.wait_for(reported, timeout=controller.QUERY_TIMEOUT)
+
+
+async def _worker(
+    controller: RotelController, mix: Dict[str, float], count: int, latencies: List[float], rng: random.Random
+) -> int:
+    messages = list(mix)
+    params = [_param_for(message) for message in messages]
+    weights = list(mix.values())
+    indexes = range(len(messages))
+    errors = 0
+    for _ in range(count):
+        index = rng.choices(indexes, weights)[0]
+        started = time.perf_counter()
+        try:
+            await _round_trip(controller, messages[index], params[index])
+        except (asyncio.TimeoutError, ControllerException):
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    return errors
+
+
+async def run_benchmark(
+    messages: int = 1000,
+    concurrency: int = 1,
+    mix: Optional[Dict[str, float]] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    seed: int = 0,
+) -> dict:
+    """Runs the benchmark and returns its results.
+
+    If `host` is ``None``, a simulator is started on a local port.
+    """
+    mix = mix or DEFAULT_MIX
+    amp = None
+    if host is None:
+        amp = RA1572(host="127.0.0.1", port=0)
+        await amp.start()
+        host, port = "127.0.0.1", amp.port
+
+    config = RotelConfigBase(min_volume=RA1572.VOL_MIN, max_volume=RA1572.VOL_MAX, sources=RA1572._SOURCES)
+    controller = RotelController(host, port, config)
+    latencies: List[float] = []
+    try:
+        async with controller:
+            controller.send_command("rs232_update_on")
+            await controller.query("power")
+
+            rng = random.Random(seed)
+            counts = [messages // concurrency + (index < messages % concurrency) for index in range(concurrency)]
+            started = time.perf_counter()
+            errors = await asyncio.gather(
+                *(_worker(controller, mix, count, latencies, random.Random(rng.random())) for count in counts)
+            )
+            duration = time.perf_counter() - started
+    finally:
+        if amp:
+            await amp.stop()
+
+    latencies.sort()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "loop": describe_loop(asyncio.get_event_loop()),
+        "messages": messages,
+        "concurrency": concurrency,
+        "mix": mix,
+        "duration": duration,
+        "errors": sum(errors),
+        "msgs_per_sec": len(latencies) / duration if duration else None,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else None,
+            "p50": _ms(percentile(latencies, 50)),
+            "p95": _ms(percentile(latencies, 95)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else 1000 * value
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Rotel controller against the RA1572 simulator.")
+    parser.add_argument("-n", "--messages", type=int, default=1000, help="number of messages to send")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="number of concurrent senders")
+    parser.add_argument("-m", "--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. volume?=4,vol_up=1")
+    parser.add_argument("--host", help="amp to benchmark instead of a local simulator")
+    parser.add_argument("--port", type=int, default=9590)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loop", choices=LOOP_POLICIES, default="asyncio", help="event loop to run on")
+    parser.add_argument("-o", "--output", help="JSON file for the results, default is stdout")
+    args = parser.parse_args(argv)
+    set_loop_policy(args.loop)
+
+    try:
+        results = asyncio.run(run_benchmark(args.messages, args.concurrency, args.mix, args.host, args.port, args.seed))
+    except ControllerException as e:
+        parser.exit(1, "%s\n" % e)
+
+    latency = results["latency_ms"]
+    print(
+        "%.0f msgs/s, p50 %.3fms, p95 %.3fms, p99 %.3fms, %s errors"
+        % (results["msgs_per_sec"], latency["p50"], latency["p95"], latency["p99"], results["errors"]),
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
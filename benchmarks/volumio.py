@@ -0,0 +1,100 @@
+"""Measures how fast :class:`~amp_mate.controller.volumio.VolumioController` ingests the states pushed by Volumio.
+
+A :class:`~amp_mate.simulators.volumio_simulator.Volumio` simulator pushes its state at a given rate and payload size,
+unless the URL of another server is given. The time spent in
+:meth:`~amp_mate.controller.volumio.VolumioController.handle_push_state` is measured for every push, as well as the
+CPU time of the whole process, which includes decoding the messages.
+
+Run ``python -m benchmarks.volumio --help`` from the repository root for the options. Results are written as JSON so
+runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from amp_mate.controller.volumio import VolumioController
+from amp_mate.event_loop import LOOP_POLICIES, describe_loop, set_loop_policy
+from amp_mate.simulators import volumio_simulator
+from amp_mate.simulators.volumio_simulator import Volumio
+from benchmarks.rotel import _ms, percentile
+
+
+async def run_benchmark(
+    duration: float = 5, push_rate: float = 50, queue_size: int = 0, art_size: int = 0, url: Optional[str] = None
+) -> dict:
+    """Runs the benchmark for `duration` seconds and returns its results.
+
+    If `url` is ``None``, a simulator is started on a local port.
+    """
+    volumio = None
+    if url is None:
+        volumio = Volumio(host="127.0.0.1", port=0, push_rate=push_rate, queue_size=queue_size, art_size=art_size)
+        await volumio.start()
+        url = volumio.url
+
+    parts = urlsplit(url)
+    controller = VolumioController("%s://%s" % (parts.scheme, parts.hostname), parts.port)
+    timings: List[float] = []
+    controller.add_push_listener(lambda state, elapsed: timings.append(elapsed))
+    try:
+        async with controller:
+            cpu, started = time.process_time(), time.perf_counter()
+            await asyncio.sleep(duration)
+            cpu, elapsed = time.process_time() - cpu, time.perf_counter() - started
+    finally:
+        if volumio:
+            await volumio.stop()
+
+    timings.sort()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "loop": describe_loop(asyncio.get_event_loop()),
+        "push_rate": push_rate,
+        "queue_size": queue_size,
+        "art_size": art_size,
+        "duration": elapsed,
+        "pushes": len(timings),
+        "pushes_per_sec": len(timings) / elapsed,
+        "cpu_percent": 100 * cpu / elapsed,
+        "handle_ms": {
+            "mean": 1000 * sum(timings) / len(timings) if timings else None,
+            "p50": _ms(percentile(timings, 50)),
+            "p99": _ms(percentile(timings, 99)),
+            "max": _ms(timings[-1] if timings else None),
+        },
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Volumio controller's state ingestion.")
+    parser.add_argument("-d", "--duration", type=float, default=5, help="seconds to run for")
+    volumio_simulator.add_arguments(parser)
+    parser.add_argument("--url", help="Volumio to benchmark instead of a local simulator")
+    parser.add_argument("--loop", choices=LOOP_POLICIES, default="asyncio", help="event loop to run on")
+    parser.add_argument("-o", "--output", help="JSON file for the results, default is stdout")
+    parser.set_defaults(push_rate=50)
+    args = parser.parse_args(argv)
+    set_loop_policy(args.loop)
+
+    results = asyncio.run(run_benchmark(args.duration, args.push_rate, args.queue_size, args.art_size, args.url))
+    print(
+        "%.0f pushes/s, %.0f%% CPU, handling p50 %.3fms, p99 %.3fms"
+        % (results["pushes_per_sec"], results["cpu_percent"], results["handle_ms"]["p50"], results["handle_ms"]["p99"]),
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
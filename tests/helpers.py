@@ -0,0 +1,29 @@
+"""Helpers shared by the tests that run controllers against the simulators."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Tuple
+
+from amp_mate.controller.rotel import RotelConfigBase
+
+ConnectionHandler = Callable[[asyncio.StreamReader, asyncio.StreamWriter], object]
+
+
+def make_config() -> RotelConfigBase:
+    return RotelConfigBase(min_volume=0, max_volume=96, sources=["cd", "aux"])
+
+
+async def start_server(handle_connection: ConnectionHandler) -> Tuple[asyncio.AbstractServer, int]:
+    """Serves `handle_connection`, such as a simulator's, on a free local port. Returns the server and its port."""
+    server = await asyncio.start_server(handle_connection, host="127.0.0.1", port=0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@asynccontextmanager
+async def serving(handle_connection: ConnectionHandler) -> AsyncIterator[int]:
+    """Serves `handle_connection` on a free local port for the duration of the block, and gives the port."""
+    server, port = await start_server(handle_connection)
+    try:
+        yield port
+    finally:
+        server.close()
+        await server.wait_closed()
@@ -1,6 +1,14 @@
+import asyncio
+import os
+import tempfile
+import time
+from typing import Tuple
 from unittest import TestCase
 
-from amp_mate.simulators.rotel_simulator import RA1572
+from amp_mate.controller.rotel import RotelController
+from amp_mate.controller.transport import UnixTransport
+from amp_mate.simulators.rotel_simulator import RA1572, Farm, LinkEmulation
+from tests.helpers import make_config, serving
 
 
 class TestRA1572Power(TestCase):
@@ -162,3 +170,186 @@ class TestRA1572HandleMessage(TestCase):
         self.amp._mute = True
         self.amp.handle_message("mute!")
         self.assertFalse(self.amp._mute)
+
+    def test_sets_source(self):
+        for src in self.amp._SOURCES:
+            with self.subTest(value=src):
+                self.amp.handle_message("%s!" % src)
+                self.assertEqual(self.amp._source, src)
+
+    def test_answers_every_request(self):
+        for req in ["power", "source", "volume", "mute"]:
+            with self.subTest(value=req):
+                self.assertTrue(self.amp.handle_message("%s?" % req).startswith("%s=" % req))
+
+    def test_command_with_underscore_in_name(self):
+        self.amp.handle_message("rs232_update_on!")
+        self.assertTrue(self.amp._auto_update)
+
+    def test_replies_to_command_in_auto_update(self):
+        self.amp._auto_update = True
+        self.amp._volume = 10
+        self.assertEqual(self.amp.handle_message("vol_up!"), "volume=11$")
+
+    def test_raises_for_invalid_argument(self):
+        for msg in ["vol_!", "vol_up_up!", "vol_UP!", "volume!", "vol_up?"]:
+            with self.subTest(value=msg):
+                self.assertRaises(ValueError, self.amp.handle_message, msg)
+
+
+class TestRA1572Stream(TestCase):
+    def setUp(self) -> None:
+        self.amp = RA1572()
+
+    def test_splits_pipelined_messages(self):
+        messages, pending = self.amp.split_messages("vol_up!vol_up!mute?")
+        self.assertEqual(messages, ["vol_up!", "vol_up!", "mute?"])
+        self.assertEqual(pending, "")
+
+    def test_keeps_incomplete_message(self):
+        messages, pending = self.amp.split_messages("vol_up!vol_")
+        self.assertEqual(messages, ["vol_up!"])
+        messages, pending = self.amp.split_messages(pending + "up!")
+        self.assertEqual(messages, ["vol_up!"])
+        self.assertEqual(pending, "")
+
+    def test_replies_are_joined(self):
+        self.amp._volume = 10
+        result = self.amp.handle_messages(["vol_up!", "vol_up!", "volume?", "mute?"])
+        self.assertEqual(result, "volume=12$mute=off$")
+
+    def test_invalid_message_is_skipped(self):
+        result = self.amp.handle_messages(["toto!", "power?"])
+        self.assertEqual(result, "power=on$")
+
+
+class TestRA1572Requests(TestCase):
+    def setUp(self) -> None:
+        self.amp = RA1572()
+
+    def test_answers_every_request(self):
+        for req in self.amp._REQUESTS:
+            with self.subTest(value=req):
+                self.assertRegex(self.amp.handle_message("%s?" % req), r"^%s=[^$]+\$$" % req)
+
+    def test_tone_format(self):
+        for value, expected in [(0, "000"), (2, "+02"), (-10, "-10")]:
+            with self.subTest(value=value):
+                self.amp._bass = value
+                self.assertEqual(self.amp.bass, "bass=%s" % expected)
+
+    def test_balance_format(self):
+        for value, expected in [(0, "000"), (-5, "L05"), (15, "R15")]:
+            with self.subTest(value=value):
+                self.amp._balance = value
+                self.assertEqual(self.amp.balance, "balance=%s" % expected)
+
+    def test_speaker_format(self):
+        for speakers, expected in [((True, True), "a_b"), ((True, False), "a"), ((False, False), "off")]:
+            with self.subTest(value=expected):
+                self.amp._speaker_a, self.amp._speaker_b = speakers
+                self.assertEqual(self.amp.speaker, "speaker=%s" % expected)
+
+
+class TestLinkEmulation(TestCase):
+    def test_invalid_settings(self):
+        for kwargs in [dict(baudrate=0), dict(latency=-1), dict(jitter=-1), dict(drop_rate=2), dict(duplicate_rate=-1)]:
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                LinkEmulation(**kwargs)
+
+    def test_drop_and_duplicate(self):
+        replies = ["volume=10$", "mute=off$"]
+        self.assertEqual(LinkEmulation(drop_rate=1).frames(replies), [])
+        self.assertEqual(
+            LinkEmulation(duplicate_rate=1).frames(replies), ["volume=10$", "volume=10$", "mute=off$", "mute=off$"]
+        )
+
+    def test_seed_makes_choices_repeatable(self):
+        replies = ["volume=%02i$" % volume for volume in range(50)]
+
+        def frames():
+            return LinkEmulation(drop_rate=0.3, duplicate_rate=0.3, seed=1).frames(replies)
+
+        self.assertEqual(frames(), frames())
+        self.assertNotEqual(frames(), replies)
+
+    def test_jitter_is_bounded(self):
+        link = LinkEmulation(latency=0.01, jitter=0.005)
+        for _ in range(100):
+            self.assertTrue(0.01 <= link.delay() <= 0.015)
+
+    def round_trip(self, link: LinkEmulation, data: bytes, size: int) -> Tuple[bytes, float]:
+        amp = RA1572(link=link)
+
+        async def run():
+            async with serving(amp.handle_connection) as port:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                started = time.monotonic()
+                writer.write(data)
+                received = await reader.readexactly(size)
+                elapsed = time.monotonic() - started
+                writer.close()
+                return received, elapsed
+
+        return asyncio.run(run())
+
+    def test_replies_are_delayed(self):
+        # 7 bytes sent and 10 received at 1000 bytes per second, plus 50ms of latency
+        received, elapsed = self.round_trip(LinkEmulation(baudrate=10000, latency=0.05), b"volume?", 10)
+        self.assertEqual(received, b"volume=00$")
+        self.assertGreaterEqual(elapsed, 0.067)
+
+    def test_replies_stay_in_order_with_jitter(self):
+        link = LinkEmulation(jitter=0.01, seed=1)
+        received, _ = self.round_trip(link, b"volume?mute?power?", 28)
+        self.assertEqual(received, b"volume=00$mute=off$power=on$")
+
+
+class TestFarm(TestCase):
+    def test_invalid_count(self):
+        with self.assertRaises(ValueError):
+            Farm(0)
+
+    def test_amps_have_their_own_state(self):
+        farm = Farm(3, port=0)
+
+        async def run():
+            async with farm:
+                replies = []
+                for index, address in enumerate(farm.addresses):
+                    host, port = address.split(":")
+                    reader, writer = await asyncio.open_connection(host, int(port))
+                    writer.write(b"vol_%02i!volume?" % (index + 1))
+                    replies.append(await reader.readexactly(10))
+                    writer.close()
+                self.assertEqual(len(set(farm.addresses)), 3)
+                return replies
+
+        self.assertEqual(asyncio.run(run()), [b"volume=01$", b"volume=02$", b"volume=03$"])
+
+    def test_port_range(self):
+        self.assertEqual(Farm(3, port=9600).addresses, ["127.0.0.1:9600", "127.0.0.1:9601", "127.0.0.1:9602"])
+
+    def test_unix_sockets(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        socket_dir = os.path.join(directory.name, "amps")
+        farm = Farm(2, socket_dir=socket_dir)
+        config = make_config()
+
+        async def run():
+            async with farm:
+                controllers = [
+                    RotelController(None, None, config, transport=UnixTransport(path)) for path in farm.addresses
+                ]
+                for controller in controllers:
+                    await controller.connect()
+                await controllers[1].set_volume(50)
+                await asyncio.sleep(0.05)
+                volumes = [controller.status.volume for controller in controllers]
+                for controller in controllers:
+                    await controller.disconnect()
+                return volumes
+
+        self.assertEqual(asyncio.run(run()), [0, 48])
+        self.assertEqual(os.listdir(socket_dir), [])
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import unittest
+
+from amp_mate.controller.base_controller import PlaybackState
+from amp_mate.controller.volumio import VolumioController
+from amp_mate.simulators.volumio_simulator import Volumio
+
+
+class TestVolumioState(unittest.TestCase):
+    def test_state_has_the_used_keys(self):
+        state = Volumio(seed=1).state()
+        for key in VolumioController._STATE_KEYS:
+            with self.subTest(key=key):
+                self.assertIn(key, state)
+        self.assertNotIn("queue", state)
+
+    def test_payload_size(self):
+        small = len(json.dumps(Volumio(seed=1).state()))
+        large = len(json.dumps(Volumio(queue_size=100, art_size=50000, seed=1).state()))
+        self.assertGreater(large - small, 50000 + 100 * 300)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            Volumio(push_rate=-1)
+
+    def test_volume(self):
+        volumio = Volumio()
+
+        async def run():
+            for value in [20, "+", "-", "-", 150, "toto"]:
+                await volumio.handle_volume("sid", value)
+            return volumio.state()["volume"]
+
+        self.assertEqual(asyncio.run(run()), 100)
+
+    def test_playback(self):
+        volumio = Volumio()
+
+        async def run():
+            statuses = []
+            for handler in [volumio.handle_pause, volumio.handle_play, volumio.handle_stop]:
+                await handler("sid")
+                statuses.append(volumio.state()["status"])
+            return statuses
+
+        self.assertEqual(asyncio.run(run()), ["pause", "play", "stop"])
+        self.assertEqual(volumio.pushes, 3)
+
+    def test_pushes_only_while_playing(self):
+        volumio = Volumio(host="127.0.0.1", port=0, push_rate=100)
+
+        async def run():
+            async with volumio:
+                await volumio.handle_pause("sid")
+                pushes = volumio.pushes
+                await asyncio.sleep(0.1)
+                self.assertEqual(volumio.pushes, pushes)
+                await volumio.handle_play("sid")
+                await asyncio.sleep(0.1)
+                self.assertGreater(volumio.pushes, pushes + 1)
+
+        asyncio.run(run())
+
+
+class TestVolumioController(unittest.TestCase):
+    def run_with_volumio(self, test, **kwargs):
+        volumio = Volumio(host="127.0.0.1", port=0, **kwargs)
+
+        async def run():
+            async with volumio:
+                controller = VolumioController("http://127.0.0.1", volumio.port)
+                async with controller:
+                    await test(controller, volumio)
+
+        asyncio.run(run())
+
+    def test_volume_and_mute(self):
+        async def test(controller, volumio):
+            self.assertEqual(await controller.get_volume(), 50)
+            refreshed = controller._cache.refreshed("volume")
+            await controller.set_volume(30)
+            await asyncio.wait_for(refreshed, 1)
+            self.assertEqual(controller.status.volume.value, 30)
+            refreshed = controller._cache.refreshed("mute")
+            await controller.set_mute()
+            await asyncio.wait_for(refreshed, 1)
+            self.assertTrue(controller.status.volume.mute)
+
+        self.run_with_volumio(test)
+
+    def test_state_is_pushed_while_playing(self):
+        async def test(controller, volumio):
+            pushes = volumio.pushes
+            await asyncio.sleep(0.1)
+            self.assertGreater(volumio.pushes - pushes, 3)
+            self.assertGreater(volumio.state()["seek"], 0)
+            self.assertIsNotNone(controller.status.playback.track)
+
+        self.run_with_volumio(test, push_rate=100, queue_size=10)
+
+    def test_playback_is_followed(self):
+        async def test(controller, volumio):
+            await controller.get_volume()  # Waits for the first state
+            with controller.status.changes.subscribe(fields=("playback",)) as changes:
+                await volumio.handle_pause("sid")
+                change = await asyncio.wait_for(changes.get(), 1)
+                self.assertEqual((change.old, change.new), (PlaybackState.PLAYING, PlaybackState.PAUSED))
+
+        self.run_with_volumio(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
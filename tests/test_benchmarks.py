@@ -0,0 +1,99 @@
+import asyncio
+import time
+import unittest
+
+from amp_mate.controller.recorder import Direction, Record, encode_event
+from benchmarks import volumio
+from benchmarks.replay import replay, replay_pushes, replay_to_rotel, replay_to_volumio
+from benchmarks.rotel import parse_mix, percentile, run_benchmark
+
+
+class TestRotelBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("volume?=4,vol_up"), {"volume?": 4, "vol_up": 1})
+
+    def test_runs_against_simulator(self):
+        results = asyncio.run(run_benchmark(messages=50, concurrency=2, mix={"volume?": 1, "vol_up": 1, "cd": 1}))
+        self.assertEqual(results["errors"], 0)
+        self.assertGreater(results["msgs_per_sec"], 0)
+        self.assertLessEqual(results["latency_ms"]["p50"], results["latency_ms"]["p99"])
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = [
+            Record(Direction.SENT, 10.0, b"rs232_update_on!"),
+            Record(Direction.RECEIVED, 10.01, b"update_mode=auto$"),
+            Record(Direction.SENT, 10.1, b"vol_up!"),
+            Record(Direction.SENT, 10.2, b"vol_up!"),
+        ]
+
+    def replay(self, speed):
+        sent = []
+
+        async def send(payload):
+            sent.append((time.monotonic(), payload))
+
+        results = asyncio.run(replay(self.records, send, speed))
+        return results, sent
+
+    def test_only_sent_records_are_replayed(self):
+        results, sent = self.replay(None)
+        self.assertEqual([payload for _, payload in sent], [b"rs232_update_on!", b"vol_up!", b"vol_up!"])
+        self.assertEqual(results["sent"], 3)
+        self.assertEqual(results["bytes_sent"], 30)
+
+    def test_timing_is_scaled(self):
+        _, sent = self.replay(2)
+        self.assertGreaterEqual(sent[2][0] - sent[0][0], 0.1)
+        self.assertLess(sent[2][0] - sent[0][0], 0.2)
+
+    def test_sessions_have_their_own_timeline(self):
+        # Recorded by a later run, the time between the runs isn't replayed
+        self.records += [Record(Direction.SESSION, 12.0, b""), Record(Direction.SENT, 12.1, b"vol_dwn!")]
+        results, sent = self.replay(2)
+        self.assertEqual(results["sent"], 4)
+        self.assertLess(sent[3][0] - sent[2][0], 0.05)
+
+    def test_replay_to_simulator(self):
+        results = asyncio.run(replay_to_rotel(self.records, speed=None))
+        self.assertEqual(results["sent"], 3)
+        # The simulator answers with update_mode=auto$ volume=01$ volume=02$
+        self.assertEqual(results["bytes_received"], 37)
+
+    def test_replay_to_volumio_simulator(self):
+        records = [
+            Record(Direction.SENT, 1.0, encode_event("getState")),
+            Record(Direction.RECEIVED, 1.1, encode_event("pushState", {"volume": 50})),
+            Record(Direction.SENT, 1.2, encode_event("volume", 30)),
+        ]
+        results = asyncio.run(replay_to_volumio(records, speed=None))
+        self.assertEqual(results["sent"], 2)
+
+    def test_replay_pushes_to_controller(self):
+        records = [Record(Direction.SENT, 1.0, encode_event("getState"))] + [
+            Record(Direction.RECEIVED, 1.0 + volume / 1000, encode_event("pushState", {"volume": volume}))
+            for volume in range(30, 60)
+        ]
+        results = asyncio.run(replay_pushes(records, speed=None))
+        self.assertEqual(results["sent"], 30)
+        # With the state pushed when the controller connects
+        self.assertEqual(results["states_handled"], 31)
+
+
+class TestVolumioBenchmark(unittest.TestCase):
+    def test_runs_against_simulator(self):
+        results = asyncio.run(volumio.run_benchmark(duration=0.2, push_rate=50, queue_size=10, art_size=1000))
+        self.assertGreater(results["pushes"], 0)
+        self.assertLessEqual(results["handle_ms"]["p50"], results["handle_ms"]["max"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,16 @@
+import asyncio
 import unittest
 
-from amp_mate.controller import VolumeStatus
+from amp_mate.controller import (
+    ChangeBus,
+    ControllerStatus,
+    OverflowPolicy,
+    PlaybackState,
+    PlaybackStatus,
+    StatusCache,
+    Track,
+    VolumeStatus,
+)
 
 
 class TestVolumeStatus(unittest.TestCase):
@@ -18,35 +28,169 @@ class TestVolumeStatus(unittest.TestCase):
                 self.assertEqual(vs.value, round(value))
                 self.assertIsInstance(vs.value, int)
 
-    def test_changed_is_not_set_when_value_not_changed(self):
+    def test_change_is_not_published_when_value_not_changed(self):
         vs = VolumeStatus()
         vs.value = 20
-        vs.changed.clear()
+        changes = vs.bus.subscribe()
         vs.value = 20
-        self.assertFalse(vs.changed.is_set())
+        vs.value = 20.2
+        self.assertEqual(len(changes), 0)
 
-    def test_changed_is_set_when_value_changed(self):
+    def test_change_is_published_when_value_changed(self):
         vs = VolumeStatus()
         vs.value = 20
-        vs.changed.clear()
+        changes = vs.bus.subscribe()
         vs.value = 21
-        self.assertTrue(vs.changed.is_set())
+        change = changes.get_nowait()
+        self.assertEqual((change.field, change.old, change.new), ("volume", 20, 21))
 
     def test_returns_none_if_not_set(self):
         vs = VolumeStatus()
         self.assertIsNone(vs.value)
         self.assertIsNone(vs.mute)
 
-    def test_is_not_changed_when_value_not_set(self):
-        vs = VolumeStatus()
-        self.assertFalse(vs.changed.is_set())
-
-    def test_changed_is_not_set_when_mute_not_changed(self):
+    def test_change_is_published_when_mute_changed(self):
         vs = VolumeStatus()
+        changes = vs.bus.subscribe()
         for value in [True, False]:
             with self.subTest(value=value):
                 vs.mute = value
-                self.assertTrue(vs.changed.is_set())
+                self.assertEqual(changes.get_nowait().new, value)
+
+
+class TestControllerStatus(unittest.TestCase):
+    def test_changes_are_published_on_the_status_bus(self):
+        status = ControllerStatus(volume=VolumeStatus(), playback=PlaybackStatus())
+        changes = status.changes.subscribe()
+        status.volume.value = 10
+        status.volume.mute = True
+        status.playback.state = PlaybackState.PLAYING
+        self.assertEqual(
+            [(c.field, c.new) for c in [changes.get_nowait() for _ in range(3)]],
+            [("volume", 10), ("mute", True), ("playback", PlaybackState.PLAYING)],
+        )
+
+    def test_snapshot(self):
+        status = ControllerStatus(volume=VolumeStatus(), playback=PlaybackStatus())
+        status.volume.value = 10
+        status.playback.track = Track(title="So What")
+        snapshot = status.snapshot()
+        status.volume.value = 20
+        self.assertEqual(snapshot.volume, (10, None))
+        self.assertEqual(snapshot.playback.track.title, "So What")
+        self.assertIsNone(snapshot.playback.state)
+        with self.assertRaises(AttributeError):
+            snapshot.volume.value = 30
+
+    def test_snapshot_without_playback(self):
+        self.assertIsNone(ControllerStatus(volume=VolumeStatus()).snapshot().playback)
+
+    def test_statuses_have_no_dict(self):
+        for status in [VolumeStatus(), PlaybackStatus(), ControllerStatus()]:
+            with self.subTest(status=type(status).__name__), self.assertRaises(AttributeError):
+                status.toto = 1
+
+
+class TestChangeBus(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bus = ChangeBus()
+
+    def test_every_subscriber_gets_every_change(self):
+        first, second = self.bus.subscribe(), self.bus.subscribe()
+        for value in range(3):
+            self.bus.publish("volume", value, value + 1)
+        for changes in (first, second):
+            with self.subTest(subscription=changes):
+                self.assertEqual([changes.get_nowait().new for _ in range(3)], [1, 2, 3])
+
+    def test_fields_are_filtered(self):
+        changes = self.bus.subscribe(fields=["mute"])
+        self.bus.publish("volume", 1, 2)
+        self.bus.publish("mute", False, True)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes.get_nowait().field, "mute")
+
+    def test_keep_latest_merges_changes_of_the_same_field(self):
+        changes = self.bus.subscribe(maxsize=2, policy=OverflowPolicy.KEEP_LATEST)
+        self.bus.publish("volume", 1, 2)
+        self.bus.publish("mute", False, True)
+        self.bus.publish("volume", 2, 3)
+        self.assertEqual(changes.dropped, 1)
+        self.assertEqual(changes.get_nowait()[:3], ("mute", False, True))
+        self.assertEqual(changes.get_nowait()[:3], ("volume", 1, 3))
+
+    def test_keep_latest_drops_merged_change_without_effect(self):
+        changes = self.bus.subscribe(maxsize=1, policy=OverflowPolicy.KEEP_LATEST)
+        self.bus.publish("volume", 1, 2)
+        self.bus.publish("volume", 2, 1)
+        self.assertEqual(len(changes), 0)
+
+    def test_drop_oldest(self):
+        changes = self.bus.subscribe(maxsize=2, policy=OverflowPolicy.DROP_OLDEST)
+        for value in range(3):
+            self.bus.publish("volume", value, value + 1)
+        self.assertEqual([changes.get_nowait().new for _ in range(2)], [2, 3])
+
+    def test_closed_subscription_gets_nothing(self):
+        with self.bus.subscribe() as changes:
+            pass
+        self.bus.publish("volume", 1, 2)
+        self.assertIsNone(changes.get_nowait())
+
+    def test_get_waits_for_change(self):
+        async def run():
+            changes = self.bus.subscribe()
+            asyncio.get_event_loop().call_later(0.01, self.bus.publish, "volume", 1, 2)
+            return await asyncio.wait_for(changes.get(), timeout=1)
+
+        self.assertEqual(asyncio.run(run()).new, 2)
+
+
+class TestStatusCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = StatusCache(ttl={"volume": 10}, default_ttl=0)
+        self.queries = 0
+
+    async def query(self):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        self.cache.refresh("volume")
+
+    def test_field_is_fresh_after_refresh(self):
+        self.assertFalse(self.cache.is_fresh("volume"))
+        self.cache.refresh("volume")
+        self.assertTrue(self.cache.is_fresh("volume"))
+
+    def test_field_expires_after_ttl(self):
+        self.cache.refresh("mute")
+        self.assertFalse(self.cache.is_fresh("mute"))
+
+    def test_invalidate(self):
+        self.cache.refresh("volume")
+        self.cache.invalidate()
+        self.assertFalse(self.cache.is_fresh("volume"))
+
+    def test_concurrent_callers_share_the_query(self):
+        async def run():
+            await asyncio.gather(*(self.cache.ensure_fresh("volume", self.query) for _ in range(5)))
+
+        asyncio.run(run())
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(self.cache.misses, 5)
+
+    def test_no_query_when_fresh(self):
+        self.cache.refresh("volume")
+        asyncio.run(self.cache.ensure_fresh("volume", self.query))
+        self.assertEqual(self.queries, 0)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_refreshed_is_resolved_on_refresh(self):
+        async def run():
+            refreshed = self.cache.refreshed("volume")
+            self.cache.refresh("volume")
+            await asyncio.wait_for(refreshed, timeout=1)
+
+        asyncio.run(run())
 
 
 if __name__ == "__main__":
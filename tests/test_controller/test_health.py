@@ -0,0 +1,121 @@
+import asyncio
+import time
+import unittest
+
+from amp_mate.controller.health import HealthMonitor
+from amp_mate.controller.rotel import RotelController
+from amp_mate.controller.volumio import VolumioController
+from amp_mate.simulators.rotel_simulator import RA1572
+from amp_mate.simulators.volumio_simulator import Volumio
+from tests.helpers import make_config, serving
+
+
+class TestHealthMonitor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.monitor = None
+        self.answer_after = None
+
+    def probe(self):
+        if self.answer_after is not None:
+            asyncio.get_event_loop().call_later(self.answer_after, self.monitor.alive)
+
+    def run_monitor(self, duration: float, deadline: float = 0.3, traffic: float = None) -> bool:
+        """Runs the monitor for up to `duration` seconds and returns whether it found the connection dead."""
+        self.monitor = HealthMonitor(self.probe, deadline)
+
+        async def send_traffic():
+            while True:
+                await asyncio.sleep(traffic)
+                self.monitor.alive()
+
+        async def run():
+            sender = asyncio.ensure_future(send_traffic()) if traffic else None
+            try:
+                await asyncio.wait_for(self.monitor.run(), timeout=duration)
+                return True
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                if sender:
+                    sender.cancel()
+
+        return asyncio.run(run())
+
+    def test_invalid_deadline(self):
+        with self.assertRaises(ValueError):
+            HealthMonitor(self.probe, deadline=0.1)
+
+    def test_traffic_is_proof_of_life(self):
+        self.assertFalse(self.run_monitor(0.6, traffic=0.05))
+        self.assertEqual(self.monitor.probes, 0)
+
+    def test_unanswered_probe_is_dead_by_deadline(self):
+        started = time.monotonic()
+        self.assertTrue(self.run_monitor(2))
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(self.monitor.probes, 1)
+
+    def test_answered_probe_adapts_idle_interval(self):
+        self.answer_after = 0.01
+        self.assertFalse(self.run_monitor(1))
+        self.assertGreaterEqual(self.monitor.probes, 2)
+        self.assertAlmostEqual(self.monitor.rtt, 0.01, delta=0.01)
+        # The first probe is sent halfway to the deadline, the next ones once the deadline is close
+        self.assertAlmostEqual(self.monitor.idle_interval, 0.2, delta=0.01)
+
+    def test_slow_answer_is_dead(self):
+        self.answer_after = 0.5
+        self.assertTrue(self.run_monitor(1))
+
+    def test_failed_probe_is_dead(self):
+        async def probe():
+            raise ConnectionResetError()
+
+        async def run():
+            await asyncio.wait_for(HealthMonitor(probe, deadline=0.3).run(), timeout=1)
+
+        asyncio.run(run())
+
+
+class TestControllerHealth(unittest.TestCase):
+    def run_rotel(self, handle_connection, test):
+        async def run():
+            async with serving(handle_connection) as port:
+                controller = RotelController("127.0.0.1", port, make_config(), bootstrap=False, health_deadline=0.4)
+                async with controller:
+                    await test(controller)
+
+        asyncio.run(run())
+
+    def test_rotel_silent_amp_is_disconnected(self):
+        async def handle_connection(reader, writer):
+            # Reads like a half-open connection, nothing ever comes back
+            while await reader.read(100):
+                pass
+
+        async def test(controller):
+            started = time.monotonic()
+            await asyncio.wait_for(controller.wait_disconnected(), timeout=2)
+            self.assertLess(time.monotonic() - started, 0.6)
+            self.assertEqual(controller.health.probes, 1)
+
+        self.run_rotel(handle_connection, test)
+
+    def test_rotel_idle_amp_is_probed(self):
+        async def test(controller):
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.shield(controller.wait_disconnected()), timeout=1)
+            self.assertGreaterEqual(controller.health.probes, 2)
+            self.assertTrue(controller.status.power)
+
+        self.run_rotel(RA1572().handle_connection, test)
+
+    def test_volumio_pushes_are_proof_of_life(self):
+        async def run():
+            async with Volumio(host="127.0.0.1", port=0, push_rate=20) as volumio:
+                async with VolumioController("http://127.0.0.1", volumio.port, health_deadline=0.4) as controller:
+                    await asyncio.sleep(1)
+                    self.assertTrue(controller._sio.connected)
+                    self.assertEqual(controller.health.probes, 0)
+
+        asyncio.run(run())
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from amp_mate.controller.helpers import Coalescer
+
+
+class TestCoalescer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.received = []
+
+    async def slow_send(self, value):
+        self.received.append(value)
+        await asyncio.sleep(0.01)
+
+    def test_raises_for_invalid_rate(self):
+        for rate in [0, -1]:
+            with self.subTest(value=rate), self.assertRaises(ValueError):
+                Coalescer(self.slow_send, max_rate=rate)
+
+    def test_only_latest_value_is_sent(self):
+        async def run():
+            coalescer = Coalescer(self.slow_send)
+            coalescer.start()
+            for value in range(50):
+                coalescer.push(value)
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.05)
+            await coalescer.stop()
+            return coalescer
+
+        coalescer = asyncio.run(run())
+        self.assertEqual(self.received[-1], 49)
+        self.assertLess(len(self.received), 50)
+        self.assertEqual(coalescer.sent, len(self.received))
+        self.assertEqual(coalescer.sent + coalescer.merged, 50)
+
+    def test_value_pushed_before_start_is_sent(self):
+        async def run():
+            coalescer = Coalescer(self.slow_send)
+            coalescer.push(1)
+            coalescer.push(2)
+            coalescer.start()
+            await asyncio.sleep(0.02)
+            await coalescer.stop()
+            return coalescer
+
+        coalescer = asyncio.run(run())
+        self.assertEqual(self.received, [2])
+        self.assertEqual(coalescer.merged, 1)
+
+    def test_rate_is_limited(self):
+        async def send(value):
+            self.received.append(value)
+
+        async def run():
+            coalescer = Coalescer(send, max_rate=20)
+            coalescer.start()
+            for value in range(20):
+                coalescer.push(value)
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.06)
+            await coalescer.stop()
+
+        asyncio.run(run())
+        # 20 values over ~0.25s at 20/s
+        self.assertLessEqual(len(self.received), 7)
+        self.assertEqual(self.received[-1], 19)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import unittest
+
+from amp_mate.controller.metrics import Histogram, MetricsServer, Registry, SpanTracker, time_to_ready_gauge
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observations_are_bucketed(self):
+        histogram = Histogram(buckets=[0.1, 1])
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = Registry()
+
+    def test_same_name_and_labels_give_the_same_metric(self):
+        first = self.registry.counter("requests", "Requests.", path="/")
+        self.assertIs(self.registry.counter("requests", "Requests.", path="/"), first)
+        self.assertIsNot(self.registry.counter("requests", "Requests.", path="/metrics"), first)
+
+    def test_raises_for_other_kind(self):
+        self.registry.counter("requests", "Requests.")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("requests", "Requests.")
+
+    def test_render(self):
+        self.registry.counter("requests", "Requests.", path='/"a"').inc(2)
+        self.registry.gauge("temperature", "Temperature.", lambda: 21.5)
+        self.registry.histogram("latency", "Latency.", buckets=[0.1], controller="amp").observe(0.05)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP requests Requests.\n"
+            "# TYPE requests counter\n"
+            'requests{path="/\\"a\\""} 2\n'
+            "# HELP temperature Temperature.\n"
+            "# TYPE temperature gauge\n"
+            "temperature 21.5\n"
+            "# HELP latency Latency.\n"
+            "# TYPE latency histogram\n"
+            'latency_bucket{controller="amp",le="0.1"} 1\n'
+            'latency_bucket{controller="amp",le="+Inf"} 1\n'
+            'latency_count{controller="amp"} 1\n'
+            'latency_sum{controller="amp"} 0.05\n',
+        )
+
+
+class TestControllerMetrics(unittest.TestCase):
+    def test_time_to_ready_gauge(self):
+        registry = Registry()
+        gauge = time_to_ready_gauge("amp", registry)
+        self.assertIs(time_to_ready_gauge("amp", registry), gauge)
+        gauge.set(0.25)
+        self.assertIn('amp_mate_time_to_ready_seconds{controller="amp"} 0.25\n', registry.render())
+
+
+class TestSpanTracker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.spans = SpanTracker(Histogram(), max_open=2)
+
+    def test_close_observes_duration(self):
+        self.spans.open(10, time.monotonic() - 0.1)
+        self.assertGreaterEqual(self.spans.close(10), 0.1)
+        self.assertEqual(self.spans.histogram.count, 1)
+
+    def test_close_without_span(self):
+        self.assertIsNone(self.spans.close(10))
+        self.assertEqual(self.spans.histogram.count, 0)
+
+    def test_earliest_time_is_kept(self):
+        self.spans.open(10, time.monotonic() - 1)
+        self.spans.open(10, time.monotonic())
+        self.assertGreaterEqual(self.spans.close(10), 1)
+
+    def test_oldest_span_is_dropped(self):
+        for key in range(3):
+            self.spans.open(key, time.monotonic())
+        self.assertEqual(len(self.spans), 2)
+        self.assertEqual(self.spans.dropped, 1)
+        self.assertIsNone(self.spans.close(0))
+
+
+class TestMetricsServer(unittest.TestCase):
+    def request(self, path: str) -> bytes:
+        registry = Registry()
+        registry.counter("requests", "Requests.").inc()
+
+        async def run():
+            server = MetricsServer(registry, port=0)
+            await server.start()
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(b"GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n" % path.encode())
+                response = await reader.read()
+                writer.close()
+                return response
+            finally:
+                await server.stop()
+
+        return asyncio.run(run())
+
+    def test_serves_metrics(self):
+        response = self.request("/metrics")
+        self.assertTrue(response.startswith(b"HTTP/1.0 200 OK\r\n"))
+        self.assertTrue(response.endswith(b"\r\n\r\n# HELP requests Requests.\n# TYPE requests counter\nrequests 1\n"))
+
+    def test_other_paths_are_not_found(self):
+        self.assertTrue(self.request("/").startswith(b"HTTP/1.0 404"))
+
+
+if __name__ == "__main__":
+    unittest.main()
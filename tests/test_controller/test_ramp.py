@@ -0,0 +1,52 @@
+import unittest
+
+from amp_mate.controller.ramp import cheapest_encoding, plan_ramp
+
+ABSOLUTE = [b"vol_min!"] + [b"vol_%02i!" % volume for volume in range(1, 97)]
+
+
+class TestPlanRamp(unittest.TestCase):
+    def test_one_step_per_volume_when_slow_enough(self):
+        self.assertEqual(plan_ramp(10, 14, 1, 20), [(0.25, 11), (0.5, 12), (0.75, 13), (1, 14)])
+
+    def test_rate_is_limited(self):
+        steps = plan_ramp(0, 90, 1, 10)
+        self.assertEqual(len(steps), 10)
+        self.assertEqual(steps[-1], (1, 90))
+        self.assertEqual([volume for _, volume in steps], sorted(volume for _, volume in steps))
+
+    def test_down(self):
+        self.assertEqual(plan_ramp(2, 0, 1, 20), [(0.5, 1), (1, 0)])
+
+    def test_no_duration_sets_the_end(self):
+        self.assertEqual(plan_ramp(10, 50, 0, 20), [(0, 50)])
+
+    def test_nothing_to_do(self):
+        self.assertEqual(plan_ramp(10, 10, 1, 20), [])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            plan_ramp(0, 10, -1, 20)
+
+
+class TestCheapestEncoding(unittest.TestCase):
+    def test_absolute_wins_ties(self):
+        self.assertEqual(cheapest_encoding(10, 11, ABSOLUTE, b"vol_up!", b"vol_dwn!"), [b"vol_11!"])
+        self.assertEqual(cheapest_encoding(10, 9, ABSOLUTE, b"vol_up!", b"vol_dwn!"), [b"vol_09!"])
+
+    def test_relative_when_cheaper(self):
+        self.assertEqual(cheapest_encoding(10, 12, ABSOLUTE, b"+", b"-"), [b"+", b"+"])
+        self.assertEqual(cheapest_encoding(10, 2, ABSOLUTE, b"+", b"-"), [b"vol_02!"])
+
+    def test_unknown_current_volume(self):
+        self.assertEqual(cheapest_encoding(None, 0, ABSOLUTE, b"+", b"-"), [b"vol_min!"])
+
+    def test_offset(self):
+        self.assertEqual(cheapest_encoding(None, 12, ABSOLUTE, b"+", b"-", offset=10), [b"vol_02!"])
+
+    def test_same_volume(self):
+        self.assertEqual(cheapest_encoding(10, 10, ABSOLUTE, b"+", b"-"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
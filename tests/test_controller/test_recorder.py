@@ -0,0 +1,92 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+
+from amp_mate.controller.recorder import MAGIC, Direction, Record, Recorder, decode_event, read_records
+from amp_mate.controller.rotel import RotelController
+from amp_mate.controller.volumio import VolumioController
+from amp_mate.simulators.rotel_simulator import RA1572
+from tests.helpers import make_config, serving
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "session.log")
+
+    def read_messages(self):
+        return [record for record in read_records(self.path) if record.direction is not Direction.SESSION]
+
+    def test_records_are_read_back(self):
+        with Recorder(self.path) as recorder:
+            recorder.record(Direction.SENT, b"volume?", timestamp=1.5)
+            recorder.record(Direction.RECEIVED, b"volume=20$", timestamp=1.75)
+        self.assertEqual(
+            self.read_messages(),
+            [Record(Direction.SENT, 1.5, b"volume?"), Record(Direction.RECEIVED, 1.75, b"volume=20$")],
+        )
+
+    def test_records_are_appended(self):
+        for payload in [b"vol_up!", b"vol_dwn!"]:
+            with Recorder(self.path) as recorder:
+                recorder.record(Direction.SENT, payload)
+        self.assertEqual([record.payload for record in self.read_messages()], [b"vol_up!", b"vol_dwn!"])
+
+    def test_sessions_are_marked(self):
+        for payload in [b"vol_up!", b"vol_dwn!"]:
+            with Recorder(self.path) as recorder:
+                recorder.record(Direction.SENT, payload)
+        self.assertEqual(
+            [(record.direction, record.payload) for record in read_records(self.path)],
+            [
+                (Direction.SESSION, b""),
+                (Direction.SENT, b"vol_up!"),
+                (Direction.SESSION, b""),
+                (Direction.SENT, b"vol_dwn!"),
+            ],
+        )
+
+    def test_events(self):
+        with Recorder(self.path) as recorder:
+            recorder.record_event(Direction.SENT, "volume", 20)
+            recorder.record_event(Direction.SENT, "getState")
+        self.assertEqual(
+            [decode_event(record.payload) for record in self.read_messages()], [("volume", 20), ("getState", None)]
+        )
+
+    def test_invalid_logs(self):
+        for data in [b"toto", MAGIC + b"\x00\x01", MAGIC + b"\x00" + bytes(8) + b"\x05\x00\x00\x00abc"]:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                list(read_records(io.BytesIO(data)))
+
+    def test_rotel_traffic_is_recorded(self):
+        amp = RA1572()
+
+        async def run():
+            async with serving(amp.handle_connection) as port:
+                with Recorder(self.path) as recorder:
+                    controller = RotelController("127.0.0.1", port, make_config(), bootstrap=False, recorder=recorder)
+                    async with controller:
+                        await controller.query("volume")
+
+        asyncio.run(run())
+        records = self.read_messages()
+        self.assertEqual(
+            [(record.direction, record.payload) for record in records],
+            [(Direction.SENT, b"volume?"), (Direction.RECEIVED, b"volume=00$")],
+        )
+        self.assertLessEqual(records[0].timestamp, records[1].timestamp)
+
+    def test_volumio_state_is_recorded(self):
+        with Recorder(self.path) as recorder:
+            VolumioController("localhost", recorder=recorder).handle_push_state({"volume": 20, "mute": False})
+        record = self.read_messages()[0]
+        self.assertEqual(record.direction, Direction.RECEIVED)
+        self.assertEqual(decode_event(record.payload), ("pushState", {"volume": 20, "mute": False}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import subprocess
+import sys
+import unittest
+
+from amp_mate import controller
+from amp_mate.controller.rotel import RotelController
+
+
+class OtherController(controller.Controller):
+    pass
+
+
+class TestRegistry(unittest.TestCase):
+    def test_get_controller(self):
+        self.assertIs(controller.get_controller("rotel"), RotelController)
+
+    def test_unknown_controller(self):
+        with self.assertRaises(ValueError):
+            controller.get_controller("toto")
+
+    def test_register_controller(self):
+        self.addCleanup(controller.CONTROLLERS.pop, "other_rotel")
+        controller.register_controller("other_rotel", "amp_mate.controller.rotel:RotelController")
+        self.assertIs(controller.get_controller("other_rotel"), RotelController)
+
+    def test_classes_are_attributes(self):
+        from amp_mate.controller import VolumioController
+        from amp_mate.controller.volumio import VolumioController as Imported
+
+        self.assertIs(VolumioController, Imported)
+
+    def test_registered_classes_are_attributes(self):
+        self.addCleanup(controller.CONTROLLERS.pop, "other")
+        controller.register_controller("other", "%s:OtherController" % __name__)
+        self.assertIs(controller.OtherController, OtherController)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            controller.Toto
+
+    def test_device_modules_are_not_imported(self):
+        code = (
+            "import sys, amp_mate.controller;"
+            "print('socketio' in sys.modules, 'amp_mate.controller.volumio' in sys.modules)"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+        self.assertEqual(output.split(), ["False", "False"])
+
+
+if __name__ == "__main__":
+    unittest.main()
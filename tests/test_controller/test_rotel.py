@@ -0,0 +1,462 @@
+import asyncio
+import time
+import unittest
+
+from amp_mate.controller.base_controller import ControllerException
+from amp_mate.controller.helpers import FrameBuffer, response_splitter
+from amp_mate.controller.rotel import (
+    RotelController,
+    RotelPower,
+    RotelStatus,
+    RotelStatusException,
+)
+from amp_mate.controller.scheduler import Priority
+from amp_mate.simulators.rotel_simulator import RA1572
+from tests.helpers import make_config, serving
+
+
+class TestResponseSplitter(unittest.TestCase):
+    def test_splits_param_and_value(self):
+        self.assertEqual(response_splitter(b"volume=45$"), (b"volume", b"45"))
+
+    def test_end_is_optional(self):
+        self.assertEqual(response_splitter(b"mute=on"), (b"mute", b"on"))
+
+    def test_value_is_empty_without_separator(self):
+        self.assertEqual(response_splitter(b"toto$"), (b"toto", b""))
+
+
+class TestFrameBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.frames = FrameBuffer()
+
+    def test_single_frame(self):
+        self.assertEqual(self.frames.feed(b"volume=45$"), [(b"volume", b"45")])
+        self.assertEqual(len(self.frames), 0)
+
+    def test_coalesced_frames(self):
+        result = self.frames.feed(b"volume=45$volume=46$mute=on$")
+        self.assertEqual(result, [(b"volume", b"45"), (b"volume", b"46"), (b"mute", b"on")])
+
+    def test_partial_frame_is_kept(self):
+        self.assertEqual(self.frames.feed(b"volume=45$vol"), [(b"volume", b"45")])
+        self.assertEqual(len(self.frames), 3)
+        self.assertEqual(self.frames.feed(b"ume=4"), [])
+        self.assertEqual(self.frames.feed(b"6$"), [(b"volume", b"46")])
+        self.assertEqual(len(self.frames), 0)
+
+    def test_multi_byte_end(self):
+        frames = FrameBuffer(end=b"\r\n")
+        self.assertEqual(frames.feed(b"a=1\r"), [])
+        self.assertEqual(frames.feed(b"\nb=2\r\n"), [(b"a", b"1"), (b"b", b"2")])
+
+    def test_raises_for_empty_end(self):
+        with self.assertRaises(ValueError):
+            FrameBuffer(end=b"")
+
+    def test_partial_frame_is_capped(self):
+        frames = FrameBuffer(max_size=8)
+        self.assertEqual(frames.feed(b"volume=4"), [])
+        self.assertEqual(frames.feed(b"5 noise without end"), [])
+        self.assertEqual(len(frames), 0)
+        self.assertEqual(frames.dropped, 27)
+        self.assertEqual(frames.feed(b"mute=on$"), [(b"mute", b"on")])
+
+
+class TestRotelStatus(unittest.TestCase):
+    def setUp(self) -> None:
+        self.status = RotelStatus(make_config())
+
+    def test_fields_are_none_if_not_set(self):
+        self.assertIsNone(self.status.volume)
+        self.assertIsNone(self.status.dimmer)
+
+    def test_snapshot(self):
+        self.status.update_field(b"volume", b"45")
+        self.status.update_field(b"speaker", b"a_b")
+        snapshot = self.status.snapshot()
+        self.status.update_field(b"volume", b"46")
+        self.assertEqual(snapshot.volume, 45)
+        self.assertEqual(snapshot.speakers, ("a", "b"))
+        self.assertEqual(snapshot._fields, tuple(attr for attr, _ in RotelStatus._FIELDS.values()))
+
+    def test_update_status_from_string(self):
+        self.assertTrue(self.status.update_status("volume=45$"))
+        self.assertEqual(self.status.volume, 45)
+
+    def test_changes_are_published(self):
+        changes = self.status.changes.subscribe()
+        self.status.update_field(b"volume", b"48")
+        self.status.update_field(b"volume", b"48")
+        self.status.update_field(b"mute", b"on")
+        self.status.update_field(b"power", b"on")
+        self.status.update_field(b"volume", b"96")
+        published = []
+        while len(changes):
+            change = changes.get_nowait()
+            published.append((change.field, change.old, change.new))
+        # The volume is normalised, like the other controllers' volume
+        self.assertEqual(
+            published,
+            [("volume", None, 50), ("mute", None, True), ("power", None, RotelPower.ON), ("volume", 50, 100)],
+        )
+
+    def test_returns_false_when_not_changed(self):
+        self.status.update_field(b"volume", b"45")
+        self.assertFalse(self.status.update_field(b"volume", b"45"))
+
+    def test_ignores_unknown_param(self):
+        self.assertFalse(self.status.update_field(b"update_mode", b"auto"))
+
+    def test_values_are_typed(self):
+        values = [
+            (b"power", b"on", "power", RotelPower.ON),
+            (b"power", b"standby", "power", RotelPower.OFF),
+            (b"source", b"cd", "source", "cd"),
+            (b"mute", b"on", "mute", True),
+            (b"bypass", b"off", "bypass", False),
+            (b"bass", b"-03", "bass", -3),
+            (b"treble", b"+02", "treble", 2),
+            (b"balance", b"L05", "balance", -5),
+            (b"balance", b"R12", "balance", 12),
+            (b"balance", b"000", "balance", 0),
+            (b"freq", b"44.1", "input_frequency", 44.1),
+            (b"freq", b"off", "input_frequency", None),
+            (b"speaker", b"a_b", "speakers", ("a", "b")),
+            (b"dimmer", b"3", "dimmer", 3),
+            (b"model", b"ra1572", "model", "ra1572"),
+        ]
+        for param, value, attr, expected in values:
+            with self.subTest(param=param, value=value):
+                self.status.update_field(param, value)
+                self.assertEqual(getattr(self.status, attr), expected)
+
+    def test_raises_for_invalid_value(self):
+        for param, value in [(b"volume", b"loud"), (b"volume", b"97"), (b"dimmer", b"")]:
+            with self.subTest(param=param, value=value), self.assertRaises(RotelStatusException):
+                self.status.update_field(param, value)
+
+
+class TestRotelController(unittest.TestCase):
+    """Runs the controller against the simulator."""
+
+    def setUp(self) -> None:
+        self.amp = RA1572()
+        self.writes = []
+
+    def run_with_amp(self, test, **kwargs):
+        async def run():
+            async with serving(self.amp.handle_connection) as port:
+                async with RotelController("127.0.0.1", port, make_config(), **kwargs) as controller:
+                    writelines = controller._writer.writelines
+                    controller._writer.writelines = lambda data: self.writes.append(data) or writelines(data)
+                    await test(controller)
+
+        asyncio.run(run())
+
+    def test_commands_are_sent_in_one_write(self):
+        async def test(controller):
+            for command in ["vol_up", "vol_up", "vol_up", "mute_on"]:
+                controller.send_command(command)
+            await asyncio.sleep(0.05)
+
+        self.run_with_amp(test)
+        self.assertEqual(self.writes, [[b"mute_on!", b"vol_up!", b"vol_up!", b"vol_up!"]])
+        self.assertEqual(self.amp._volume, 3)
+        self.assertTrue(self.amp._mute)
+
+    def test_commands_queued_before_connect_are_sent(self):
+        async def run():
+            async with serving(self.amp.handle_connection) as port:
+                controller = RotelController("127.0.0.1", port, make_config())
+                controller.send_command("vol_up")
+                async with controller:
+                    await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual(self.amp._volume, 1)
+
+    def test_status_is_updated_from_replies(self):
+        async def test(controller):
+            controller.send_command("rs232_update_on")
+            controller.send_command("vol_up")
+            controller.send_command("vol_up")
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 2)
+
+        self.run_with_amp(test)
+
+    def test_concurrent_get_volume_sends_one_request(self):
+        self.amp._volume = 48
+
+        async def test(controller):
+            volumes = await asyncio.gather(*(controller.get_volume() for _ in range(10)))
+            self.assertEqual(volumes, [50] * 10)
+            await controller.get_volume()
+
+        self.run_with_amp(test, bootstrap=False)
+        self.assertEqual(self.writes, [[b"volume?"]])
+
+    def test_concurrent_queries_are_pipelined(self):
+        self.amp._volume = 12
+        self.amp._mute = True
+
+        async def test(controller):
+            answers = await asyncio.gather(
+                controller.query("volume"),
+                controller.query("mute"),
+                controller.query("power"),
+                controller.query("mute"),
+            )
+            self.assertEqual(answers, [12, True, RotelPower.ON, True])
+
+        self.run_with_amp(test, bootstrap=False)
+        self.assertEqual(self.writes, [[b"volume?", b"mute?", b"power?"]])
+
+    def test_bootstrap_reads_full_state(self):
+        self.amp._volume = 30
+        self.amp._balance = -3
+
+        async def test(controller):
+            self.assertTrue(controller.is_ready)
+            self.assertIsNotNone(controller.time_to_ready)
+            self.assertEqual(controller._ready_gauge.value, controller.time_to_ready)
+            self.assertEqual(controller.status.volume, 30)
+            self.assertEqual(controller.status.balance, -3)
+            self.assertEqual(controller.status.model, "ra1572")
+            self.assertTrue(self.amp._auto_update)
+
+        self.run_with_amp(test)
+
+    def test_volume_latency_is_measured_until_amp_confirms(self):
+        async def test(controller):
+            observed = controller._volume_spans.histogram.count
+            # The amp reports its changes after the bootstrap, so this returns once it's confirmed
+            await controller.set_volume(50, timestamp=time.monotonic())
+            self.assertEqual(len(controller._volume_spans), 0)
+            self.assertEqual(controller._volume_spans.histogram.count, observed + 1)
+
+        self.run_with_amp(test)
+
+    def test_set_volume_without_auto_update_does_not_wait(self):
+        async def test(controller):
+            started = time.monotonic()
+            await controller.set_volume(50)
+            self.assertLess(time.monotonic() - started, controller.ACK_TIMEOUT)
+            self.assertEqual(await controller.query("volume"), controller.config.volume_map.to_device(50))
+
+        self.run_with_amp(test, bootstrap=False)
+
+    def test_reported_resolves_on_update(self):
+        async def test(controller):
+            reported = controller.reported("volume")
+            controller.send_command("vol_up")
+            await asyncio.wait_for(reported, timeout=1)
+
+        self.run_with_amp(test)
+
+    def test_query_raises_without_answer(self):
+        async def test(controller):
+            controller.QUERY_TIMEOUT = 0.05
+            with self.assertRaises(ControllerException):
+                await controller.query("toto")
+            self.assertEqual(controller._queries, {})
+
+        self.run_with_amp(test)
+
+    def test_get_mute(self):
+        self.amp._mute = True
+
+        async def test(controller):
+            self.assertTrue(await controller.get_mute())
+
+        self.run_with_amp(test)
+
+    def test_ramp(self):
+        self.amp._volume = 10
+
+        async def test(controller):
+            # 10 steps at MAX_RAMP_RATE
+            await controller.ramp_volume(controller.config.volume_map.from_device(20), 0.5)
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 20)
+
+        self.run_with_amp(test)
+        sent = [message for batch in self.writes for message in batch if message.startswith(b"vol_")]
+        self.assertEqual(sent, [b"vol_%02i!" % volume for volume in range(11, 21)])
+
+    def test_ramp_is_retargeted(self):
+        self.amp._volume = 10
+
+        async def test(controller):
+            ramp = controller.ramp_volume(100, 1)
+            await asyncio.sleep(0.2)
+            retargeted = controller.ramp_volume(0, 0.1)
+            await retargeted
+            self.assertTrue(ramp.cancelled())
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 0)
+
+        self.run_with_amp(test)
+
+    def test_set_volume_cancels_ramp(self):
+        async def test(controller):
+            ramp = controller.ramp_volume(100, 1)
+            await asyncio.sleep(0.1)
+            await controller.set_volume(50)
+            await asyncio.sleep(0.05)
+            self.assertTrue(ramp.cancelled())
+            self.assertEqual(controller.status.volume, 48)
+
+        self.run_with_amp(test)
+
+    def test_mute_and_power_off_cancel_ramp(self):
+        self.amp._volume = 30
+
+        async def test(controller):
+            for command in ["mute_on", "power_off"]:
+                with self.subTest(command=command):
+                    fade = controller.fade_out(1)
+                    await asyncio.sleep(0.1)
+                    controller.send_command(command)
+                    await asyncio.sleep(0.05)
+                    self.assertTrue(fade.cancelled())
+                    volume = controller.status.volume
+                    await asyncio.sleep(0.1)
+                    self.assertEqual(controller.status.volume, volume)
+            # The volume before the fade is kept to come back to
+            self.assertEqual(controller._faded_volume, 30)
+
+        self.run_with_amp(test)
+
+    def test_fade_out_and_in(self):
+        self.amp._volume = 30
+
+        async def test(controller):
+            await controller.fade_out(0.1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 0)
+            await controller.fade_in(0.1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 30)
+            self.assertIsNone(controller.fade_in())
+
+        self.run_with_amp(test)
+
+    def test_mute_during_fade_in(self):
+        self.amp._volume = 30
+
+        async def test(controller):
+            await controller.fade_out(0.1)
+            fade = controller.fade_in(1)
+            await asyncio.sleep(0.3)
+            controller.send_command("mute_on")
+            await asyncio.sleep(0.05)
+            self.assertTrue(fade.cancelled())
+            self.assertLess(controller.status.volume, 30)
+            await controller.fade_in(0.1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 30)
+
+        self.run_with_amp(test)
+
+    def test_pause_and_play_during_fade_in(self):
+        self.amp._volume = 30
+
+        async def test(controller):
+            await controller.fade_out(0.1)
+            controller.fade_in(1)
+            await asyncio.sleep(0.3)
+            await controller.fade_out(0.1)
+            await controller.fade_in(0.1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 30)
+            self.assertIsNone(controller.fade_in())
+
+        self.run_with_amp(test)
+
+    def test_set_volume_sends_amp_volume(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        for value, command in [(50, b"vol_48!"), (0, b"vol_min!"), (100, b"vol_96!")]:
+            with self.subTest(value=value):
+                asyncio.run(controller.set_volume(value))
+                self.assertEqual(controller._outgoing.pop_batch(), [command])
+
+    def test_back_to_back_set_volume(self):
+        self.amp._volume = 48
+
+        async def test(controller):
+            await asyncio.gather(controller.set_volume(20), controller.set_volume(50))
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.status.volume, 48)
+
+        self.run_with_amp(test)
+
+    def test_set_volume_during_fade(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        controller.status.volume = 30
+
+        async def test():
+            controller.fade_out(1)
+            await asyncio.sleep(0.1)
+            # The amp hasn't reported the steps of the fade yet
+            await controller.set_volume(controller.config.volume_map.from_device(30))
+
+        asyncio.run(test())
+        self.assertEqual(controller._outgoing.pop_batch(), [b"vol_30!"])
+
+    def test_set_volume_is_compared_with_commanded_volume(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        for value in [50, 20, 50]:
+            asyncio.run(controller.set_volume(value))
+        self.assertEqual(controller._outgoing.pop_batch(), [b"vol_48!"])
+        # Already commanded
+        asyncio.run(controller.set_volume(50))
+        self.assertEqual(len(controller._outgoing), 0)
+
+    def test_set_volume_doesnt_echo_amp_volume(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        controller.status.volume = 47
+        asyncio.run(controller.set_volume(controller.config.volume_map.from_device(47)))
+        self.assertEqual(len(controller._outgoing), 0)
+
+    def test_scheduling(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        for command, scheduling in [
+            ("mute_on", (Priority.SAFETY, None, False)),
+            ("mute", (Priority.SAFETY, None, False)),
+            ("power_off", (Priority.SAFETY, None, False)),
+            ("aux", (Priority.SOURCE, "source", True)),
+            ("rs232_update_on", (Priority.NORMAL, None, False)),
+            ("vol_up", (Priority.VOLUME, "vol", False)),
+            ("vol_48", (Priority.VOLUME, "vol", True)),
+            ("vol_min", (Priority.VOLUME, "vol", True)),
+            ("bass_dwn", (Priority.VOLUME, "bass", False)),
+        ]:
+            with self.subTest(command=command):
+                self.assertEqual(controller._schedule(command), scheduling)
+
+    def test_stale_commands_are_dropped(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        for command in ["vol_up", "vol_up", "bass_up", "vol_20", "cd", "volume?", "vol_30", "aux", "mute_on"]:
+            if command.endswith("?"):
+                controller.send_request(command[:-1])
+            else:
+                controller.send_command(command)
+        self.assertEqual(controller._outgoing.pop_batch(), [b"mute_on!", b"aux!", b"bass_up!", b"vol_30!", b"volume?"])
+        self.assertEqual(controller._outgoing.dropped, 4)
+
+    def test_power_off_drops_volume_commands(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        for command in ["vol_up", "vol_up", "bass_up", "power_off"]:
+            controller.send_command(command)
+        self.assertEqual(controller._outgoing.pop_batch(), [b"power_off!"])
+
+    def test_commands_are_encoded_once(self):
+        controller = RotelController("127.0.0.1", 0, make_config())
+        self.assertIs(controller._encode("vol_up", b"!"), controller._encode("vol_up", b"!"))
+        self.assertEqual(controller._encode("vol_up", b"!"), b"vol_up!")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from amp_mate.controller.scheduler import CommandScheduler, Priority
+
+
+class TestCommandScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scheduler = CommandScheduler()
+
+    def test_messages_are_sent_by_priority_then_in_order(self):
+        self.scheduler.push(b"volume?", Priority.REQUEST)
+        self.scheduler.push(b"vol_up!", Priority.VOLUME)
+        self.scheduler.push(b"rs232_update_on!")
+        self.scheduler.push(b"mute_on!", Priority.SAFETY)
+        self.scheduler.push(b"power?", Priority.REQUEST)
+        self.assertEqual(len(self.scheduler), 5)
+        self.assertEqual(
+            self.scheduler.pop_batch(), [b"mute_on!", b"rs232_update_on!", b"vol_up!", b"volume?", b"power?"]
+        )
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_superseding_message_drops_its_group(self):
+        for message in [b"vol_up!", b"bass_up!", b"vol_up!"]:
+            self.scheduler.push(message, Priority.VOLUME, group=message[:3])
+        self.scheduler.push(b"vol_20!", Priority.VOLUME, group=b"vol", supersedes=True)
+        self.assertEqual(self.scheduler.dropped, 2)
+        self.assertEqual(len(self.scheduler), 2)
+        self.assertEqual(self.scheduler.pop_batch(), [b"bass_up!", b"vol_20!"])
+
+    def test_drop(self):
+        self.scheduler.push(b"vol_up!", Priority.VOLUME)
+        self.scheduler.push(b"volume?")
+        self.assertEqual(self.scheduler.drop(Priority.VOLUME), 1)
+        self.assertEqual(self.scheduler.pop_batch(), [b"volume?"])
+
+    def test_batch_size(self):
+        for _ in range(3):
+            self.scheduler.push(b"vol_up!", Priority.VOLUME)
+        self.assertEqual(self.scheduler.pop_batch(max_bytes=15), [b"vol_up!"] * 2)
+        self.assertEqual(self.scheduler.pop_batch(max_bytes=1), [b"vol_up!"])
+        self.assertEqual(self.scheduler.pop_batch(max_bytes=1), [])
+        self.assertEqual(len(self.scheduler), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import pty
+import time
+import unittest
+
+from amp_mate.controller.rotel import RotelController
+from amp_mate.controller.transport import SerialTransport, TcpTransport, open_fd_streams
+from amp_mate.simulators.rotel_simulator import RA1572
+from tests.helpers import make_config, serving
+
+
+class TestSerialTransport(unittest.TestCase):
+    def test_byte_rate_counts_framing_bits(self):
+        self.assertEqual(SerialTransport("/dev/ttyS0", 115200).byte_rate, 11520)
+        self.assertEqual(SerialTransport("/dev/ttyS0", 9600, parity="E", stopbits=2).byte_rate, 800)
+
+    def test_invalid_settings(self):
+        for kwargs in [dict(baudrate=1234), dict(bytesize=9), dict(parity="X"), dict(stopbits=3)]:
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                SerialTransport("/dev/ttyS0", **kwargs)
+
+    def test_str(self):
+        self.assertEqual(str(SerialTransport("/dev/ttyUSB0", 9600)), "/dev/ttyUSB0@9600/8N1")
+
+
+class TestRotelOverPty(unittest.TestCase):
+    """The amp simulator runs on the master side of a pty, the controller opens the slave side as a serial device."""
+
+    def setUp(self) -> None:
+        self.amp = RA1572()
+        self.master, self.slave = pty.openpty()
+        self.addCleanup(os.close, self.slave)
+
+    def run_with_amp(self, test, **kwargs):
+        async def run():
+            reader, writer = await open_fd_streams(self.master)
+            amp_task = asyncio.ensure_future(self.amp.handle_connection(reader, writer))
+            transport = SerialTransport(os.ttyname(self.slave), 115200)
+            try:
+                async with RotelController(None, None, make_config(), transport=transport, **kwargs) as controller:
+                    await test(controller)
+            finally:
+                amp_task.cancel()
+                writer.close()
+
+        asyncio.run(run())
+
+    def test_bootstrap_and_commands(self):
+        self.amp._volume = 20
+
+        async def test(controller):
+            self.assertTrue(controller.is_ready)
+            self.assertEqual(controller.status.volume, 20)
+            controller.send_command("vol_up")
+            self.assertEqual(await controller.query("volume"), 21)
+
+        self.run_with_amp(test)
+        self.assertEqual(self.amp._volume, 21)
+
+    def test_str(self):
+        async def test(controller):
+            self.assertEqual(str(controller), "Rotel at %s@115200/8N1" % os.ttyname(self.slave))
+
+        self.run_with_amp(test, bootstrap=False)
+
+
+class TestPacing(unittest.TestCase):
+    def test_commands_queued_during_a_write_go_in_the_next_one(self):
+        amp = RA1572()
+        writes = []
+
+        async def run():
+            async with serving(amp.handle_connection) as port:
+                # 7 bytes per command, each one keeps the link busy for 7ms
+                transport = TcpTransport("127.0.0.1", port, byte_rate=1000)
+                controller = RotelController(None, None, make_config(), bootstrap=False, transport=transport)
+                async with controller:
+                    writelines = controller._writer.writelines
+                    controller._writer.writelines = lambda data: writes.append((time.monotonic(), data)) or writelines(data)
+                    controller.send_command("vol_up")
+                    await asyncio.sleep(0.001)
+                    for _ in range(3):
+                        controller.send_command("vol_up")
+                    await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual([data for _, data in writes], [[b"vol_up!"], [b"vol_up!"] * 3])
+        self.assertGreaterEqual(writes[1][0] - writes[0][0], 0.007)
+        self.assertEqual(amp._volume, 4)
+
+    def test_mute_is_sent_before_queued_volume_commands(self):
+        amp = RA1572()
+        writes = []
+
+        async def run():
+            async with serving(amp.handle_connection) as port:
+                # A batch holds 5 commands at most
+                transport = TcpTransport("127.0.0.1", port, byte_rate=700)
+                controller = RotelController(None, None, make_config(), bootstrap=False, transport=transport)
+                async with controller:
+                    controller.send_command("rs232_update_on")
+                    await asyncio.sleep(0.05)
+                    histogram = controller._mute_spans.histogram
+                    count, total = histogram.count, histogram.sum
+                    writelines = controller._writer.writelines
+                    controller._writer.writelines = lambda data: writes.append(data) or writelines(data)
+                    for _ in range(50):
+                        controller.send_command("vol_up")
+                    await asyncio.sleep(0.001)
+                    await controller.set_mute()
+                    await asyncio.sleep(0.2)
+                    return histogram.count - count, histogram.sum - total
+
+        count, duration = asyncio.run(run())
+        self.assertIn(b"mute_on!", writes[1])
+        self.assertTrue(all(len(batch) <= 5 for batch in writes))
+        self.assertEqual(count, 1)
+        self.assertLess(duration, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from amp_mate.controller.volume_map import VolumeMap, linear, logarithmic
+
+
+class TestVolumeMap(unittest.TestCase):
+    def test_linear_bounds(self):
+        volume_map = VolumeMap(0, 96)
+        self.assertEqual(volume_map.to_device(0), 0)
+        self.assertEqual(volume_map.to_device(100), 96)
+        self.assertEqual(volume_map.from_device(0), 0)
+        self.assertEqual(volume_map.from_device(96), 100)
+
+    def test_device_round_trip_is_stable(self):
+        curves = {"linear": linear, "logarithmic": logarithmic(), "steep": lambda x: x ** 4}
+        for name, curve in curves.items():
+            volume_map = VolumeMap(0, 96, curve)
+            for device_value in range(0, 97):
+                with self.subTest(curve=name, value=device_value):
+                    normalised = volume_map.from_device(device_value)
+                    self.assertEqual(volume_map.to_device(normalised, current=device_value), device_value)
+
+    def test_device_bounds_are_normalised_bounds(self):
+        curves = {"linear": linear, "logarithmic": logarithmic(), "steep": lambda x: x ** 4}
+        for name, curve in curves.items():
+            volume_map = VolumeMap(0, 96, curve)
+            with self.subTest(curve=name):
+                self.assertEqual(volume_map.from_device(0), 0)
+                self.assertEqual(volume_map.from_device(96), 100)
+
+    def test_reverse_is_non_decreasing(self):
+        for curve in [linear, logarithmic(40)]:
+            volume_map = VolumeMap(0, 96, curve)
+            values = [volume_map.from_device(device_value) for device_value in range(0, 97)]
+            self.assertEqual(values, sorted(values))
+
+    def test_logarithmic_has_finer_steps_at_low_volume(self):
+        volume_map = VolumeMap(0, 96, logarithmic())
+        self.assertLess(volume_map.to_device(50), 48)
+
+    def test_user_curve(self):
+        volume_map = VolumeMap(10, 20, lambda x: x ** 2)
+        self.assertEqual(volume_map.to_device(50), 12)
+
+    def test_raises_for_invalid_curve(self):
+        curves = [lambda x: 1 - x, lambda x: x / 2, lambda x: 2 * x, lambda x: 0.5 + (x - 0.5) * (x < 0.5)]
+        for curve in curves:
+            with self.subTest(curve=curve), self.assertRaises(ValueError):
+                VolumeMap(0, 96, curve)
+
+    def test_raises_for_out_of_range_values(self):
+        volume_map = VolumeMap(0, 96)
+        for value in [-1, 101]:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                volume_map.to_device(value)
+        for value in [-1, 97]:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                volume_map.from_device(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
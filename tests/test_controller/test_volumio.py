@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from amp_mate.controller.base_controller import PlaybackState, Track
+from amp_mate.controller.volumio import VolumioController
+from amp_mate.simulators.volumio_simulator import Volumio
+
+
+def make_state(**kwargs) -> dict:
+    state = dict(
+        status="play",
+        title="So What",
+        artist="Miles Davis",
+        album="Kind of Blue",
+        uri="mnt/NAS/so_what.flac",
+        albumart="/albumart?path=mnt/NAS",
+        seek=1000,
+        volume=30,
+        mute=False,
+    )
+    state.update(kwargs)
+    return state
+
+
+class TestHandlePushState(unittest.TestCase):
+    def setUp(self) -> None:
+        self.controller = VolumioController("localhost")
+        self.changes = self.controller.status.changes.subscribe()
+
+    def get_changes(self):
+        changes = []
+        while len(self.changes):
+            change = self.changes.get_nowait()
+            changes.append((change.field, change.old, change.new))
+        return changes
+
+    def test_first_state_is_applied(self):
+        self.controller.handle_push_state(make_state())
+        self.assertEqual(
+            self.get_changes(),
+            [
+                ("volume", None, 30),
+                ("mute", None, False),
+                ("playback", None, PlaybackState.PLAYING),
+                ("track", None, Track("So What", "Miles Davis", "Kind of Blue", "mnt/NAS/so_what.flac")),
+            ],
+        )
+
+    def test_only_changed_fields_are_applied(self):
+        self.controller.handle_push_state(make_state())
+        self.get_changes()
+        self.controller.handle_push_state(make_state(seek=2000, volume=35))
+        self.assertEqual(self.get_changes(), [("volume", 30, 35)])
+
+    def test_unchanged_state_is_not_applied(self):
+        self.controller.handle_push_state(make_state())
+        self.get_changes()
+        self.controller.handle_push_state(make_state(seek=3000, albumart="/albumart?path=other"))
+        self.assertEqual(self.get_changes(), [])
+
+    def test_track_change(self):
+        self.controller.handle_push_state(make_state())
+        self.get_changes()
+        self.controller.handle_push_state(make_state(status="pause", title="Freddie Freeloader"))
+        self.assertEqual(
+            self.get_changes(),
+            [
+                ("playback", PlaybackState.PLAYING, PlaybackState.PAUSED),
+                (
+                    "track",
+                    Track("So What", "Miles Davis", "Kind of Blue", "mnt/NAS/so_what.flac"),
+                    Track("Freddie Freeloader", "Miles Davis", "Kind of Blue", "mnt/NAS/so_what.flac"),
+                ),
+            ],
+        )
+
+    def test_unknown_status(self):
+        with self.assertLogs("amp_mate.controller.volumio", "WARNING"):
+            self.controller.handle_push_state(make_state(status="loading"))
+        self.assertEqual(self.controller.status.playback.state, PlaybackState.ERROR)
+
+    def test_state_refreshes_cache(self):
+        self.controller.handle_push_state(make_state())
+        self.assertTrue(self.controller._cache.is_fresh("volume"))
+        self.assertTrue(self.controller._cache.is_fresh("mute"))
+
+
+class TestPushListener(unittest.TestCase):
+    def test_listener_is_called_once_state_is_handled(self):
+        pushed = []
+
+        async def run():
+            async with Volumio(host="127.0.0.1", port=0) as volumio:
+                controller = VolumioController("http://127.0.0.1", volumio.port, health_deadline=None)
+                controller.add_push_listener(lambda state, elapsed: pushed.append((state, elapsed)))
+                async with controller:
+                    self.assertEqual(await controller.get_volume(), volumio.state()["volume"])
+
+        asyncio.run(run())
+        self.assertTrue(pushed)
+        for state, elapsed in pushed:
+            self.assertEqual(state["volume"], 50)
+            self.assertGreaterEqual(elapsed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import asyncio
+import unittest
+
+from amp_mate.event_loop import describe_loop, get_loop_policy, set_loop_policy
+
+
+class TestEventLoop(unittest.TestCase):
+    def tearDown(self) -> None:
+        asyncio.set_event_loop_policy(None)
+
+    def test_asyncio_policy(self):
+        self.assertIsInstance(get_loop_policy("asyncio"), asyncio.DefaultEventLoopPolicy)
+
+    def test_raises_for_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            get_loop_policy("toto")
+
+    def test_auto_falls_back_to_asyncio(self):
+        try:
+            import uvloop
+        except ImportError:
+            self.assertIsInstance(get_loop_policy("auto"), asyncio.DefaultEventLoopPolicy)
+        else:
+            self.assertIsInstance(get_loop_policy("auto"), uvloop.EventLoopPolicy)
+
+    def test_set_loop_policy_by_name(self):
+        set_loop_policy("asyncio")
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertTrue(describe_loop(loop).startswith("asyncio."))
+
+
+if __name__ == "__main__":
+    unittest.main()
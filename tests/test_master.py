@@ -0,0 +1,259 @@
+import asyncio
+import gc
+import os
+import random
+import sys
+import time
+import unittest
+from typing import Optional
+from unittest import mock
+
+from amp_mate.simulators.rotel_simulator import RA1572, LinkEmulation
+from amp_mate.simulators.volumio_simulator import Volumio
+from tests.helpers import make_config, start_server
+
+# The master is a script run from its own directory, it imports the controller package as a top level one
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "amp_mate"))
+
+from controller import Controller, ControllerStatus, PlaybackStatus, VolumeStatus  # noqa: E402
+from controller.rotel import RotelController  # noqa: E402
+from controller.volumio import VolumioController  # noqa: E402
+from master import Master  # noqa: E402
+
+
+class FakeController(Controller):
+    """Connects after `connect_time` seconds, and fails to connect the first `failures` times."""
+
+    def __init__(self, name: str = "fake", connect_time: float = 0, failures: int = 0):
+        self.name = name
+        self.connect_time = connect_time
+        self.failures = failures
+        self.attempts = []
+        self.disconnects = 0
+        self.status = ControllerStatus(volume=VolumeStatus(), playback=PlaybackStatus())
+        self.volumes = []
+        self._lost = None
+
+    @property
+    def connected(self) -> bool:
+        return self._lost is not None and not self._lost.is_set()
+
+    async def connect(self):
+        self.attempts.append(time.monotonic())
+        await asyncio.sleep(self.connect_time)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionRefusedError("Refused")
+        self._lost = asyncio.Event()
+
+    async def disconnect(self):
+        self.disconnects += 1
+        if self._lost:
+            self._lost.set()
+
+    async def wait_disconnected(self):
+        if self._lost:
+            await self._lost.wait()
+
+    async def set_volume(self, value: int, timestamp: Optional[float] = None):
+        self.volumes.append(value)
+
+    def lose_connection(self):
+        self._lost.set()
+
+    def __str__(self):
+        return self.name
+
+
+class MasterTestCase(unittest.TestCase):
+    def make_master(self, controllers, **kwargs) -> Master:
+        master = Master(controllers, loop_policy="asyncio", **kwargs)
+        self.addCleanup(asyncio.set_event_loop_policy, None)
+        self.addCleanup(master.loop.close)
+        return master
+
+    @staticmethod
+    def run_master(master: Master, test):
+        async def run():
+            await master._connect()
+            try:
+                await test()
+            finally:
+                await master._disconnect()
+
+        master.loop.run_until_complete(run())
+
+
+class TestConnection(MasterTestCase):
+    def test_controllers_connect_concurrently(self):
+        controllers = [FakeController("fake%i" % index, connect_time=0.2) for index in range(3)]
+        master = self.make_master(controllers)
+
+        async def test():
+            self.assertTrue(all(controller.connected for controller in controllers))
+
+        started = time.monotonic()
+        self.run_master(master, test)
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_connect_timeout_is_per_controller(self):
+        fast, slow = FakeController("fast", connect_time=0.05), FakeController("slow", connect_time=5)
+        master = self.make_master([fast, slow], connect_timeout=0.2, reconnect_delay=10)
+
+        async def test():
+            self.assertTrue(fast.connected)
+            self.assertFalse(slow.connected)
+            # The abandoned attempt is torn down
+            self.assertEqual(slow.disconnects, 1)
+            self.assertEqual(fast.disconnects, 0)
+
+        started = time.monotonic()
+        self.run_master(master, test)
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_failed_attempt_is_torn_down(self):
+        controller = FakeController(failures=1)
+        master = self.make_master([controller], reconnect_delay=10)
+
+        async def test():
+            self.assertEqual(controller.disconnects, 1)
+
+        self.run_master(master, test)
+
+    def test_backoff_with_jitter(self):
+        controller = FakeController(failures=4)
+        master = self.make_master([controller], reconnect_delay=0.04, max_reconnect_delay=0.1)
+
+        async def test():
+            while not controller.connected:
+                await asyncio.sleep(0.01)
+
+        with mock.patch("master.random.uniform", wraps=random.uniform) as uniform:
+            self.run_master(master, test)
+        self.assertEqual(
+            uniform.call_args_list,
+            [mock.call(0.02, 0.04), mock.call(0.04, 0.08), mock.call(0.05, 0.1), mock.call(0.05, 0.1)],
+        )
+        pauses = [after - before for before, after in zip(controller.attempts, controller.attempts[1:])]
+        for pause, (args, _) in zip(pauses, uniform.call_args_list):
+            self.assertGreaterEqual(pause, args[0])
+
+    def test_reconnects_when_connection_is_lost(self):
+        controller = FakeController()
+        master = self.make_master([controller], reconnect_delay=0.02)
+
+        async def test():
+            controller.lose_connection()
+            while len(controller.attempts) < 2 or not controller.connected:
+                await asyncio.sleep(0.01)
+            self.assertEqual(controller.disconnects, 1)
+
+        self.run_master(master, test)
+
+    def test_silent_rotel_leaves_nothing_behind(self):
+        # Otherwise the tasks of abandoned attempts may be collected before they're counted
+        gc.disable()
+        self.addCleanup(gc.enable)
+        connections = []
+
+        async def handle_connection(reader, writer):
+            connections.append(writer)
+            while await reader.read(100):
+                pass
+            writer.close()
+
+        def pending(name: str) -> int:
+            return sum(task.get_coro().__qualname__ == "RotelController." + name for task in asyncio.all_tasks())
+
+        master = self.make_master([], connect_timeout=0.1, reconnect_delay=0.05, max_reconnect_delay=0.05)
+        server, port = master.loop.run_until_complete(start_server(handle_connection))
+        rotel = RotelController("127.0.0.1", port, make_config())
+        master._controllers.append(rotel)
+
+        async def test():
+            await asyncio.sleep(0.5)
+            # Only the attempt in progress, if any, is still open
+            self.assertGreater(len(connections), 2)
+            self.assertLessEqual(sum(not writer.is_closing() for writer in connections), 1)
+            for name in ("_read_responses", "_write_commands", "_watch_health"):
+                self.assertLessEqual(pending(name), 1, name)
+
+        try:
+            self.run_master(master, test)
+        finally:
+            server.close()
+            master.loop.run_until_complete(server.wait_closed())
+
+
+class TestVolumeLink(MasterTestCase):
+    def test_slow_target_merges_updates(self):
+        amp = RA1572(link=LinkEmulation(latency=0.01))
+        player = FakeController("player")
+        config = make_config()
+        master = self.make_master([player])
+        server, port = master.loop.run_until_complete(start_server(amp.handle_connection))
+        rotel = RotelController("127.0.0.1", port, config)
+        master._controllers.append(rotel)
+        link = master.link_volume(player, rotel)
+
+        async def test():
+            await asyncio.sleep(0)  # Lets the link subscribe
+            for value in range(20, 79):
+                player.status.volume.value = value
+                await asyncio.sleep(0.002)
+            await asyncio.sleep(0.2)
+            self.assertEqual(rotel.status.volume, config.volume_map.to_device(78))
+
+        try:
+            self.run_master(master, test)
+        finally:
+            server.close()
+            master.loop.run_until_complete(server.wait_closed())
+        self.assertEqual(link.sent + link.merged, 59)
+        self.assertGreater(link.merged, 30)
+        self.assertEqual(amp._volume, config.volume_map.to_device(78))
+
+    def test_amp_volume_is_followed(self):
+        player = FakeController("player")
+        master = self.make_master([player])
+        rotel = RotelController("127.0.0.1", 0, make_config())
+        master.link_volume(rotel, player)
+
+        async def test():
+            await asyncio.sleep(0)  # Lets the link subscribe
+            # As reported by the amp when its knob is turned
+            rotel._handle_response(b"volume", b"48")
+            await asyncio.sleep(0.01)
+            self.assertEqual(player.volumes, [50])
+
+        self.run_master(master, test)
+
+    def test_amp_volume_extremes_reach_volumio(self):
+        volumio = Volumio(host="127.0.0.1", port=0)
+        master = self.make_master([])
+        master.loop.run_until_complete(volumio.start())
+        player = VolumioController("http://127.0.0.1", volumio.port)
+        master._controllers.append(player)
+        rotel = RotelController("127.0.0.1", 0, make_config())
+        link = master.link_volume(rotel, player)
+
+        async def test():
+            await asyncio.sleep(0)  # Lets the link subscribe
+            for device_volume, volume in [(b"0", 0), (b"96", 100)]:
+                rotel._handle_response(b"volume", device_volume)
+                for _ in range(100):
+                    await asyncio.sleep(0.01)
+                    if volumio.state()["volume"] == volume:
+                        break
+                self.assertEqual(volumio.state()["volume"], volume)
+
+        try:
+            self.run_master(master, test)
+        finally:
+            master.loop.run_until_complete(volumio.stop())
+            # The simulator's sockets outlive its server, they'd be destroyed pending with the loop
+            leftovers = asyncio.all_tasks(master.loop)
+            for task in leftovers:
+                task.cancel()
+            master.loop.run_until_complete(asyncio.gather(*leftovers, return_exceptions=True))
+        self.assertEqual(link.sent, 2)